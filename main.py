@@ -1,11 +1,16 @@
 import argparse
-import yaml
 import sys
 import os
-from tpipes.runner import PipelineRunner
+from tpipes.runner import PipelineRunner, PipelineContext
 from tpipes.sources import HttpSource, FileSource
-from tpipes.processors import JsonParser, Filter, Print, XmlParser, HtmlSelector, Export, Pick, Concat, Mesh, CsvParser, Lookup
+from tpipes.processors import JsonParser, Filter, Print, XmlParser, HtmlSelector, Export, Pick, Concat, Mesh, CsvParser, Lookup, Map
 from tpipes.registry import PipelineRegistry
+from tpipes.archive import export_cache, import_cache
+from tpipes.cache import prune_shared_cache
+from tpipes.batch import run_batch, print_batch_summary
+from tpipes.daemon import PipelineDaemon
+from tpipes.loader import load_pipeline, pipeline_name_from_path, uses_shared_cache, PipelineConfigError
+from tpipes.spill import parse_size
 
 BLOCK_REGISTRY = {
     'http_source': HttpSource,
@@ -20,125 +25,35 @@ BLOCK_REGISTRY = {
     'pick': Pick,
     'export': Export,
     'print': Print,
-    'lookup': Lookup
+    'lookup': Lookup,
+    'map': Map
 }
 
-def load_config(path: str):
-    with open(path, 'r') as f:
-        return yaml.safe_load(f)
-
-import shutil
-import zipfile
-import glob
-
-def run_pipeline(path: str, refresh: bool = False):
+def run_pipeline(path: str, refresh: bool = False, shared_cache: bool = False, max_memory: int = None,
+                 parallel_threshold: int = None):
     try:
-        config = load_config(path)
-        
-        # Derive pipeline name from file path
-        # e.g., ./pipelines/my_pipe.yaml -> my_pipe
-        pipeline_name = os.path.splitext(os.path.basename(path))[0]
-        
-        # Flexible config: can be list of steps or dict with 'steps'
-        pipeline_steps = config
-        if isinstance(config, dict):
-             if 'steps' in config:
-                 pipeline_steps = config['steps']
-             else:
-                 print("Error: Config root must be a list of steps or a dict containing 'steps'.")
-                 sys.exit(1)
-        
-        if not isinstance(pipeline_steps, list):
-             print(f"Error: Pipeline steps must be a list, got {type(pipeline_steps)}")
-             sys.exit(1)
-
-        runner = PipelineRunner(pipeline_steps, BLOCK_REGISTRY, pipeline_name=pipeline_name)
+        pipeline_steps, options = load_pipeline(path, BLOCK_REGISTRY)
+        pipeline_name = pipeline_name_from_path(path)
+
+        context = PipelineContext(block_registry=BLOCK_REGISTRY, pipeline_name=pipeline_name,
+                                  shared_cache=shared_cache or uses_shared_cache(options),
+                                  max_memory=max_memory or parse_size(options.get('max_memory')),
+                                  parallel_threshold=parallel_threshold if parallel_threshold is not None
+                                  else options.get('parallel_threshold'))
+        runner = PipelineRunner(pipeline_steps, BLOCK_REGISTRY, context=context, output=options.get('output'))
         runner.run(force_refresh=refresh)
         
     except FileNotFoundError:
         print(f"Error: Config file '{path}' not found.")
+    except PipelineConfigError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"An error occurred: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
 
-def export_cache(pipeline_name_or_path: str, output_path: str):
-    # Determine pipeline name
-    if os.path.exists(pipeline_name_or_path):
-        pipeline_name = os.path.splitext(os.path.basename(pipeline_name_or_path))[0]
-        source_yaml_path = pipeline_name_or_path
-    else:
-        pipeline_name = pipeline_name_or_path
-        source_yaml_path = None # We might look it up in registry if needed, but for now optional
-
-    cache_dir = os.path.join('.', '.cache', pipeline_name)
-    
-    if not os.path.exists(cache_dir):
-        print(f"Error: No cache found for pipeline '{pipeline_name}' at {cache_dir}")
-        return
-
-    print(f"Exporting cache for '{pipeline_name}' to '{output_path}'...")
-    
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # 1. Add cache files
-        # We walk the directory to add all files
-        for root, dirs, files in os.walk(cache_dir):
-            for file in files:
-                if file.endswith(".pkl"):
-                    abs_path = os.path.join(root, file)
-                    # Archive name should be relative to facilitate clean import
-                    # We store it as .cache/<pipeline_name>/<file> provided we extract correctly
-                    # OR we just store as <pipeline_name>/<file> inside zip?
-                    # Let's store as <pipeline_name>/<file>
-                    arcname = os.path.join(pipeline_name, file)
-                    zipf.write(abs_path, arcname)
-                    print(f"  Added {file}")
-        
-        # 2. Add source YAML if available
-        if source_yaml_path:
-             zipf.write(source_yaml_path, os.path.basename(source_yaml_path))
-             print(f"  Added source config: {os.path.basename(source_yaml_path)}")
-             
-    print(f"Done. Exported to {output_path}")
-
-def import_cache(zip_path: str):
-    if not os.path.exists(zip_path):
-        print(f"Error: File '{zip_path}' not found.")
-        return
-        
-    print(f"Importing cache from '{zip_path}'...")
-    
-    with zipfile.ZipFile(zip_path, 'r') as zipf:
-        # Check contents
-        file_list = zipf.namelist()
-        
-        # Logic: 
-        # If file is like "pipeline_name/hash.pkl", extract it to .cache/pipeline_name/hash.pkl
-        # If file is "*.yaml", extract it to current dir?
-        
-        for file in file_list:
-             if file.endswith(".pkl"):
-                  # It should have the directory structure in it
-                  # Extract to .cache/
-                  # zipfile extract uses the full path in arcname
-                  target_path = os.path.join('.', '.cache', file)
-                  
-                  # Ensure target dir structure exists
-                  target_dir = os.path.dirname(target_path)
-                  os.makedirs(target_dir, exist_ok=True)
-                  
-                  with open(target_path, "wb") as f_out:
-                       f_out.write(zipf.read(file))
-                  print(f"  Imported cache: {file}")
-             
-             elif file.endswith(".yaml") or file.endswith(".yml"):
-                  # Extract config to current directory
-                  zipf.extract(file, ".")
-                  print(f"  Imported config: {file}")
-                  
-    print("Done.")
-
 def main():
     registry = PipelineRegistry()
     
@@ -146,9 +61,15 @@ def main():
     subparsers = parser.add_subparsers(dest='command', help='Commands')
 
     # Run command
-    run_parser = subparsers.add_parser('run', help='Run a pipeline')
-    run_parser.add_argument('name_or_path', help='Name of registered pipeline OR path to YAML file')
+    run_parser = subparsers.add_parser('run', help='Run one or more pipelines')
+    run_parser.add_argument('name_or_path', nargs='*', help='Name of registered pipeline OR path to YAML file')
     run_parser.add_argument("--refresh", action="store_true", help="Force refresh of cache")
+    run_parser.add_argument("--all", action="store_true", help="Run every registered pipeline")
+    run_parser.add_argument("-j", "--jobs", type=int, default=1, help="Pipelines to run in parallel (batch mode)")
+    run_parser.add_argument("--timeout", type=float, help="Per-pipeline timeout in seconds (batch mode)")
+    run_parser.add_argument("--shared-cache", action="store_true", help="Use the cache namespace shared across pipelines")
+    run_parser.add_argument("--parallel-threshold", type=int, help="Input records above which filter/pick/csv_parser/html_selector run on all cores (0 disables)")
+    run_parser.add_argument("--max-memory", type=parse_size, help="Spill intermediate results larger than this to disk (e.g. 512M, 2G)")
 
     # Register command
     reg_parser = subparsers.add_parser('register', help='Register a pipeline')
@@ -158,6 +79,14 @@ def main():
     # List command
     subparsers.add_parser('list', help='List registered pipelines')
 
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', help='Keep pipelines loaded and run them on a schedule')
+    serve_parser.add_argument('names', nargs='*', help='Registered pipelines to serve (default: all)')
+    serve_parser.add_argument('--every', type=float, help="Default interval in seconds for pipelines without a 'schedule'")
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Address for the trigger endpoint')
+    serve_parser.add_argument('--port', type=int, default=8765, help='Port for the trigger endpoint')
+    serve_parser.add_argument('--workers', type=int, default=4, help='Pipelines that may run at the same time')
+
     # Cache command
     cache_parser = subparsers.add_parser('cache', help='Manage cache')
     cache_sub = cache_parser.add_subparsers(dest='cache_command')
@@ -165,25 +94,48 @@ def main():
     cexport = cache_sub.add_parser('export', help='Export cache to zip')
     cexport.add_argument('pipeline', help='Pipeline name OR path to YAML file')
     cexport.add_argument('output', help='Output zip file path')
+    cexport.add_argument('--since', help='Previous archive or manifest; only export entries it does not contain')
+    cexport.add_argument('-j', '--jobs', type=int, help='Parallel compression workers (default: CPU count)')
     
     cimport = cache_sub.add_parser('import', help='Import cache from zip')
     cimport.add_argument('input', help='Input zip file path')
 
+    cprune = cache_sub.add_parser('prune', help='Delete shared cache entries no pipeline references')
+    cprune.add_argument('--max-age', type=float, help='Drop refs of pipelines not run for this many days first')
+    cprune.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
     args = parser.parse_args()
 
     if args.command == 'run':
-        target = args.name_or_path
-        # Check if it's a registered name
-        path = registry.get_pipeline_path(target)
-        if not path:
-            # If not registered, assume it's a path
-            path = target
-        
-        if not os.path.exists(path):
-             print(f"Error: Pipeline '{target}' not found in registry and file '{target}' does not exist.")
-             sys.exit(1)
-             
-        run_pipeline(path, refresh=args.refresh)
+        names = list(registry.pipelines.keys()) if args.all else list(dict.fromkeys(args.name_or_path))
+        if not names:
+            run_parser.print_help()
+            sys.exit(1)
+
+        targets = []
+        for target in names:
+            # Check if it's a registered name
+            path = registry.get_pipeline_path(target)
+            if not path:
+                # If not registered, assume it's a path
+                path = target
+            
+            targets.append((target, path))
+
+        if len(targets) == 1 and not args.all and not args.timeout:
+            target, path = targets[0]
+            if not os.path.exists(path):
+                 print(f"Error: Pipeline '{target}' not found in registry and file '{target}' does not exist.")
+                 sys.exit(1)
+            run_pipeline(targets[0][1], refresh=args.refresh, shared_cache=args.shared_cache, max_memory=args.max_memory,
+                         parallel_threshold=args.parallel_threshold)
+        else:
+            results = run_batch(targets, BLOCK_REGISTRY, jobs=args.jobs, timeout=args.timeout, refresh=args.refresh,
+                                shared_cache=args.shared_cache, max_memory=args.max_memory,
+                                parallel_threshold=args.parallel_threshold)
+            print_batch_summary(results)
+            if any(r['status'] != 'ok' for r in results):
+                sys.exit(1)
 
     elif args.command == 'register':
         name = args.name
@@ -197,18 +149,34 @@ def main():
     elif args.command == 'list':
         registry.list_pipelines()
     
+    elif args.command == 'serve':
+        daemon = PipelineDaemon(registry, BLOCK_REGISTRY, names=args.names,
+                                default_interval=args.every, workers=args.workers)
+        try:
+            daemon.serve_forever(host=args.host, port=args.port)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
     elif args.command == 'cache':
         if args.cache_command == 'export':
-             export_cache(args.pipeline, args.output)
+             export_cache(args.pipeline, args.output, since=args.since, workers=args.jobs)
         elif args.cache_command == 'import':
              import_cache(args.input)
+        elif args.cache_command == 'prune':
+             result = prune_shared_cache(max_age_days=args.max_age, dry_run=args.dry_run)
+             for name in result['dropped_refs']:
+                 print(f"  Dropped stale refs: {name}")
+             verb = "Would remove" if args.dry_run else "Removed"
+             print(f"{verb} {len(result['removed'])} entries ({result['freed']} bytes), "
+                   f"{result['kept']} still referenced.")
         else:
              cache_parser.print_help()
 
     else:
         # Fallback for backward compatibility or simple usage:
         # If arguments provided and not a command, try to treat as run
-        if len(sys.argv) > 1 and sys.argv[1] not in ['run', 'register', 'list', 'cache'] and not sys.argv[1].startswith('-'):
+        if len(sys.argv) > 1 and sys.argv[1] not in ['run', 'register', 'list', 'serve', 'cache'] and not sys.argv[1].startswith('-'):
              # Assume implicit run
              target = sys.argv[1]
              path = registry.get_pipeline_path(target) or target
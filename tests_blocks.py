@@ -1,11 +1,24 @@
 import unittest
-from tpipes.processors import JsonParser, XmlParser, HtmlSelector, Filter, Export, Print, CsvParser, Lookup
+from tpipes.processors import JsonParser, XmlParser, HtmlSelector, Filter, Export, Print, CsvParser, Lookup, Pick, Concat, Map, Mesh
 from tpipes.sources import FileSource, HttpSource
 import os
 import csv
+import gzip
 import json
 import shutil
 from unittest.mock import patch, MagicMock
+import tempfile
+import time
+import zipfile
+from tpipes.archive import export_cache, import_cache, load_manifest
+from tpipes.cache import CacheStore, prune_shared_cache
+from tpipes.core import Block
+from tpipes.runner import PipelineRunner, PipelineContext
+from tpipes.daemon import CronSchedule, PipelineDaemon
+from tpipes.batch import run_batch
+from tpipes import loader
+from tpipes.spill import SpilledRecords
+from datetime import datetime
 
 
 
@@ -87,6 +100,11 @@ class TestBlocks(unittest.TestCase):
         self.assertEqual(len(result_semi), 2)
         self.assertEqual(result_semi[1]['val'], 'b')
 
+        # Already parsed records pass through, including spilled ones
+        with tempfile.TemporaryDirectory() as tmp:
+            spilled = SpilledRecords.from_iterable(result, tmp)
+            self.assertIs(block.process(spilled, None), spilled)
+
     def test_export_json_csv(self):
         os.makedirs('output_test', exist_ok=True)
         data = [{'id': 1, 'name': 'test'}]
@@ -211,5 +229,658 @@ class TestBlocks(unittest.TestCase):
         self.assertEqual(result_nested, 'Alice')
 
 
+    def test_cache_archive_delta_roundtrip(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                os.makedirs('.cache/pipe')
+                for name, payload in [('a', b'same'), ('b', b'same'), ('c', b'other')]:
+                    with open(f'.cache/pipe/{name}.tpc', 'wb') as f:
+                        f.write(payload)
+
+                export_cache('pipe', 'full.zip')
+                manifest = load_manifest('full.zip')
+                self.assertEqual(len(manifest['entries']), 3)
+                with zipfile.ZipFile('full.zip') as zipf:
+                    objects = [n for n in zipf.namelist() if n.startswith('objects/')]
+                self.assertEqual(len(objects), 2)  # a and b deduplicated
+
+                with open('.cache/pipe/d.tpc', 'wb') as f:
+                    f.write(b'new')
+                export_cache('pipe', 'delta.zip', since='full.zip')
+                with zipfile.ZipFile('delta.zip') as zipf:
+                    objects = [n for n in zipf.namelist() if n.startswith('objects/')]
+                self.assertEqual(len(objects), 1)
+
+                shutil.rmtree('.cache')
+                import_cache('full.zip')
+                import_cache('delta.zip')
+                with open('.cache/pipe/b.tpc', 'rb') as f:
+                    self.assertEqual(f.read(), b'same')
+                with open('.cache/pipe/d.tpc', 'rb') as f:
+                    self.assertEqual(f.read(), b'new')
+
+                # Same size but different bytes under the same key is replaced, not kept
+                with open('.cache/pipe/c.tpc', 'wb') as f:
+                    f.write(b'stale')
+                import_cache('full.zip')
+                with open('.cache/pipe/c.tpc', 'rb') as f:
+                    self.assertEqual(f.read(), b'other')
+            finally:
+                os.chdir(cwd)
+
+
+    def test_cache_store_roundtrip_and_safety(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = CacheStore(tmp)
+            for value in ["raw text", b"raw bytes", [{'id': 1, 'tags': ['a', 'b']}], {'blob': bytearray(b'x' * 100000)}]:
+                store.save('key', value)
+                self.assertEqual(store.load('key'), value)
+
+            class Evil:
+                def __reduce__(self):
+                    return (os.system, ('echo unsafe',))
+
+            store.save('evil', [Evil()])
+            self.assertIsNone(store.load('evil'))
+
+
+    def test_warm_run_loads_only_deepest_step(self):
+        calls = []
+
+        class Append(Block):
+            def process(self, data, context):
+                calls.append(self.config['value'])
+                return (data or []) + [self.config['value']]
+
+        registry = {'append': Append, 'print': Print}
+        steps = [{'type': 'append', 'config': {'value': i}} for i in range(5)] + [{'type': 'print'}]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='warm')
+            self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), [0, 1, 2, 3, 4])
+            self.assertEqual(calls, [0, 1, 2, 3, 4])
+
+            calls.clear()
+            with patch.object(CacheStore, 'load', wraps=context.cache.load) as load:
+                result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            self.assertEqual(result, [0, 1, 2, 3, 4])
+            self.assertEqual(calls, [])
+            self.assertEqual(load.call_count, 1)
+
+
+    def test_cron_schedule(self):
+        start = datetime(2026, 10, 19, 10, 7)  # a Monday
+        self.assertEqual(CronSchedule('*/15 * * * *').next_after(start), datetime(2026, 10, 19, 10, 15))
+        self.assertEqual(CronSchedule('0 9 * * 1-5').next_after(start), datetime(2026, 10, 20, 9, 0))
+        self.assertEqual(CronSchedule('0 0 * * 7').next_after(start), datetime(2026, 10, 25, 0, 0))
+        self.assertEqual(CronSchedule('30 2 1 * *').next_after(start), datetime(2026, 11, 1, 2, 30))
+        with self.assertRaises(ValueError):
+            CronSchedule('* * *')
+
+    def test_daemon_reload_rebuilds_context_when_options_change(self):
+        registry = MagicMock()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                with open('pipe.yaml', 'w') as f:
+                    f.write("steps:\n  - type: file_source\n    config: {path: a.csv}\n")
+                registry.get_pipeline_path.return_value = 'pipe.yaml'
+                daemon = PipelineDaemon(registry, {'file_source': FileSource}, names=['pipe'])
+                daemon.load()
+                pipe = daemon.pipelines['pipe']
+                context = pipe.context
+                self.assertIsNone(context.max_memory)
+
+                with open('pipe.yaml', 'w') as f:
+                    f.write("max_memory: 1M\ncache: shared\nsteps:\n  - type: file_source\n    config: {path: a.csv}\n")
+                os.utime('pipe.yaml', (time.time() + 5, time.time() + 5))
+                daemon._reload(pipe)
+                self.assertIsNot(pipe.context, context)
+                self.assertEqual(pipe.context.max_memory, 1024 * 1024)
+                self.assertIsNotNone(pipe.context.refs_path)
+
+                # Unrelated edits keep the warm context
+                context = pipe.context
+                os.utime('pipe.yaml', (time.time() + 10, time.time() + 10))
+                daemon._reload(pipe)
+                self.assertIs(pipe.context, context)
+            finally:
+                os.chdir(cwd)
+
+
+    def test_run_batch_isolates_failures(self):
+        registry = {'file_source': FileSource, 'csv_parser': CsvParser}
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                with open('data.csv', 'w') as f:
+                    f.write("id,val\n1,a\n")
+                with open('good.yaml', 'w') as f:
+                    f.write("- type: file_source\n  config: {path: data.csv}\n- type: csv_parser\n")
+                with open('bad.yaml', 'w') as f:
+                    f.write("- type: file_source\n  config: {path: missing.csv}\n")
+                with open('more.csv', 'w') as f:
+                    f.write("id,val\n2,b\n")
+                # Pipelines run in non-daemonic processes, so they can start process pools of their own
+                with open('multi.yaml', 'w') as f:
+                    f.write("- type: file_source\n  config: {path: '*.csv', parse: csv, workers: 2}\n"
+                            "- type: export\n  config: {path: out.json}\n")
+
+                results = run_batch([('bad', 'bad.yaml'), ('good', 'good.yaml'), ('multi', 'multi.yaml'),
+                                     ('gone', 'gone.yaml')], {**registry, 'export': Export}, jobs=2, timeout=30)
+                with open('out.json') as f:
+                    self.assertEqual([r['id'] for r in json.load(f)], ['1', '2'])
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual([r['name'] for r in results], ['bad', 'good', 'multi', 'gone'])
+        self.assertEqual((results[3]['status'], results[3]['error']), ('error', 'file not found'))
+        self.assertEqual(results[0]['status'], 'error')
+        self.assertIn('FileNotFoundError', results[0]['error'])
+        self.assertEqual(results[1]['status'], 'ok')
+        self.assertEqual(results[1]['misses'], 2)
+        self.assertEqual(results[2]['status'], 'ok')
+
+
+    def test_run_batch_timeout_stops_pool_workers(self):
+        class Hang(Block):
+            def process(self, data, context):
+                worker = context.process_pool().submit(os.getpid).result()
+                with open('worker.pid', 'w') as f:
+                    f.write(str(worker))
+                time.sleep(60)
+
+        def alive(pid):
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    return 'State:\tZ' not in f.read()
+            except FileNotFoundError:
+                return False
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                with open('hang.yaml', 'w') as f:
+                    f.write("parallel_threshold: 1\nsteps:\n  - type: hang\n")
+                results = run_batch([('hang', 'hang.yaml')], {'hang': Hang}, timeout=3)
+                with open('worker.pid') as f:
+                    worker = int(f.read())
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(results[0]['status'], 'timeout')
+        deadline = time.time() + 5
+        while alive(worker) and time.time() < deadline:
+            time.sleep(0.1)
+        self.assertFalse(alive(worker))
+
+
+    def test_shared_cache_across_pipelines(self):
+        calls = []
+
+        class Fetch(Block):
+            def process(self, data, context):
+                calls.append(self.config['url'])
+                return [{'id': 1}, {'id': 2}]
+
+        registry = {'fetch': Fetch, 'pick': Pick}
+        fetch = {'type': 'fetch', 'config': {'url': 'http://api'}}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ['first', 'second']:
+                context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name=name, shared_cache=True)
+                PipelineRunner([fetch, {'type': 'pick', 'config': {'key': 'id'}}], registry, context=context).run(verbose=False)
+            self.assertEqual(calls, ['http://api'])
+            self.assertEqual(context.stats, {'hits': 2, 'misses': 0})
+
+            # Entries referenced by either pipeline survive pruning; orphans do not
+            context.cache.save('orphan', 'unused')
+            result = prune_shared_cache(base_dir=tmp, grace_seconds=0)
+            self.assertEqual(result['removed'], ['orphan.tpc'])
+            self.assertTrue(context.cache.exists(context.used_keys.pop()))
+
+
+    def test_incremental_file_source_merges_new_rows(self):
+        registry = {'file_source': FileSource, 'csv_parser': CsvParser, 'filter': Filter, 'export': Export}
+        with tempfile.TemporaryDirectory() as tmp:
+            log = os.path.join(tmp, 'log.csv')
+            out = os.path.join(tmp, 'errors.csv')
+            with open(log, 'w') as f:
+                f.write("id,level\n1,error\n2,info\n")
+            steps = [
+                {'type': 'file_source', 'config': {'path': log, 'incremental': True, 'header_lines': 1}},
+                {'type': 'csv_parser', 'config': {'delimiter': ','}},
+                {'type': 'filter', 'config': {'key': 'level', 'value': 'error'}},
+                {'type': 'export', 'config': {'path': out, 'format': 'csv', 'append': True}},
+            ]
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='inc')
+
+            result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            self.assertEqual([r['id'] for r in result], ['1'])
+
+            with open(log, 'a') as f:
+                f.write("3,error\n4,info\n")
+            with patch.object(CsvParser, 'process', wraps=CsvParser().process) as parse:
+                result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            self.assertEqual(parse.call_args[0][0], "id,level\n3,error\n4,info\n")
+            self.assertEqual([r['id'] for r in result], ['1', '3'])
+            with open(out) as f:
+                self.assertEqual(f.read().split(), ['id,level', '1,error', '3,error'])
+
+            # A rewritten file is read in full again
+            with open(log, 'w') as f:
+                f.write("id,level\n9,error\n")
+            result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            self.assertEqual([r['id'] for r in result], ['9'])
+
+    def test_incremental_chains_keep_their_own_watermark(self):
+        registry = {'file_source': FileSource, 'csv_parser': CsvParser, 'json_parser': JsonParser,
+                    'filter': Filter, 'mesh': Mesh}
+        with tempfile.TemporaryDirectory() as tmp:
+            log = os.path.join(tmp, 'log.csv')
+            with open(log, 'w') as f:
+                f.write("id,level\n1,error\n2,info\n")
+
+            # Both branches read the same file; header_lines defaults to 1 for .csv
+            def branch(level):
+                return [{'type': 'file_source', 'config': {'path': log, 'incremental': True, 'encoding': 'utf-8'}},
+                        {'type': 'csv_parser'}, {'type': 'filter', 'config': {'key': 'level', 'value': level}}]
+            steps = [{'type': 'mesh', 'config': {'mapping': {'err': branch('error'), 'inf': branch('info')}}}]
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='inc')
+
+            PipelineRunner(steps, registry, context=context).run(verbose=False)
+            with open(log, 'a') as f:
+                f.write("3,error\n4,info\n")
+            result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            self.assertEqual([r['id'] for r in result['err']], ['1', '3'])
+            self.assertEqual([r['id'] for r in result['inf']], ['2', '4'])
+
+            # A line still being written (here cut inside a multi-byte character) waits for the next run
+            line = "5é,info\n".encode('utf-8')
+            with open(log, 'ab') as f:
+                f.write(line[:2])
+            result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            self.assertEqual([r['id'] for r in result['inf']], ['2', '4'])
+            with open(log, 'ab') as f:
+                f.write(line[2:])
+            with patch.object(FileSource, 'process') as full_read:
+                result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            full_read.assert_not_called()
+            self.assertEqual([r['id'] for r in result['inf']], ['2', '4', '5é'])
+
+            # Appended bytes are not a JSON document, so an unchanged or grown file is re-read in full
+            doc = os.path.join(tmp, 'doc.json')
+            with open(doc, 'w') as f:
+                f.write('{"a": 1}')
+            steps = [{'type': 'file_source', 'config': {'path': doc, 'incremental': True}}, {'type': 'json_parser'}]
+            for _ in range(2):
+                self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), {'a': 1})
+
+            # Compressed files are always read in full, but a rewrite still reaches cached steps after the merge
+            gz_doc = os.path.join(tmp, 'doc.json.gz')
+            registry['lookup'] = Lookup
+            steps = [{'type': 'file_source', 'config': {'path': gz_doc, 'incremental': True}}, {'type': 'json_parser'},
+                     {'type': 'lookup', 'config': {'lookup_key': 'at', 'source_key': 'values'}}]
+            for value in ('old', 'new'):
+                with gzip.open(gz_doc, 'wt') as f:
+                    f.write(json.dumps({'at': 0, 'values': [value]}))
+                self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), value)
+
+
+    def test_compiled_pipeline_cache(self):
+        registry = {'file_source': FileSource, 'csv_parser': CsvParser, 'concat': Concat}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'pipe.yaml')
+            plans = os.path.join(tmp, 'plans')
+            with open(path, 'w') as f:
+                f.write("- type: concat\n  config:\n    sources:\n      - type: file_source\n        config: {path: a.csv}\n")
+
+            steps, _ = loader.load_pipeline(path, registry, plan_cache_dir=plans)
+            with patch.object(loader, 'load_config') as load_config:
+                self.assertEqual(loader.load_pipeline(path, registry, plan_cache_dir=plans)[0], steps)
+            load_config.assert_not_called()
+
+            # Edits invalidate the plan, and nested steps are validated
+            with open(path, 'w') as f:
+                f.write("- type: concat\n  config:\n    sources:\n      - type: nope\n")
+            with self.assertRaises(loader.PipelineConfigError):
+                loader.load_pipeline(path, registry, plan_cache_dir=plans)
+
+
+    def test_map_runs_templated_sub_pipeline_per_record(self):
+        fetched = []
+
+        class Fetch(Block):
+            def process(self, data, context):
+                if self.config['url'].endswith('/3'):
+                    raise ValueError("boom")
+                fetched.append(self.config['url'])
+                return {'detail': self.config['url']}
+
+        registry = {'fetch': Fetch}
+        config = {'steps': [{'type': 'fetch', 'config': {'url': 'http://api/x/{id}'}}],
+                  'into': 'info', 'on_error': 'skip', 'workers': 3}
+        records = [{'id': 1}, {'id': 2}, {'id': 3}]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='map')
+            result = Map(config).process(records, context)
+            self.assertEqual([r['id'] for r in result], [1, 2])
+            self.assertEqual(result[1]['info'], {'detail': 'http://api/x/2'})
+
+            # Re-runs only fetch items that are not cached yet
+            fetched.clear()
+            result = Map(config).process(records + [{'id': 4}], context)
+            self.assertEqual(fetched, ['http://api/x/4'])
+            self.assertEqual([r['id'] for r in result], [1, 2, 4])
+
+            with self.assertRaises(ValueError):
+                Map({**config, 'on_error': 'fail'}).process(records, context)
+            self.assertEqual(Map({**config, 'on_error': 'null'}).process(records, context)[2]['info'], None)
+
+
+    def test_paginated_http_source_caches_all_but_tail(self):
+        rows = ['a', 'b', 'c', 'd', 'e']
+        requested = []
+
+        class FakeSession:
+            def request(self, method, url, params=None):
+                page = params['page']
+                requested.append(page)
+                response = MagicMock()
+                response.text = json.dumps({'data': rows[(page - 1) * 2:page * 2],
+                                            'pages': -(-len(rows) // 2)})
+                return response
+
+        config = {'url': 'http://api/items', 'paginate': {'page_size': 2, 'size_param': 'per_page', 'records': 'data'}}
+        with tempfile.TemporaryDirectory() as tmp:
+            context = PipelineContext(base_dir=tmp, pipeline_name='pages', http_session=FakeSession())
+            self.assertFalse(HttpSource(config).cacheable)
+            self.assertEqual(HttpSource(config).process(None, context), rows)
+            self.assertEqual(requested, [1, 2, 3])
+
+            # Page 2 is complete and cached; the first page and the short tail are re-fetched
+            requested.clear()
+            rows.append('f')
+            self.assertEqual(HttpSource(config).process(None, context), rows)
+            self.assertEqual(requested, [1, 3, 4])
+
+            # With a known page count the remaining pages are prefetched concurrently
+            requested.clear()
+            prefetched = {**config, 'paginate': {**config['paginate'], 'total_pages': 'pages', 'prefetch': 3}}
+            context.force_refresh = True
+            self.assertEqual(HttpSource(prefetched).process(None, context), rows)
+            self.assertEqual(sorted(requested), [1, 2, 3])
+
+            # Through the runner, a cached step after the source still sees a new page
+            class Upper(Block):
+                def process(self, data, context):
+                    return [row.upper() for row in data]
+
+            registry = {'http_source': HttpSource, 'upper': Upper}
+            steps = [{'type': 'http_source', 'config': config}, {'type': 'upper'}]
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='pages',
+                                      http_session=FakeSession())
+            self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), list('ABCDEF'))
+            requested.clear()
+            rows.extend(['g', 'h'])
+            self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), list('ABCDEFGH'))
+            self.assertEqual(requested, [1, 3, 4, 5])
+
+
+    def test_max_memory_spills_large_results(self):
+        class Rows(Block):
+            def process(self, data, context):
+                return [{'id': i, 'even': i % 2 == 0, 'name': f"row {i}"} for i in range(self.config['n'])]
+
+        registry = {'rows': Rows, 'concat': Concat, 'filter': Filter, 'pick': Pick, 'export': Export}
+        with tempfile.TemporaryDirectory() as tmp:
+            out_path = os.path.join(tmp, 'out.json')
+            steps = [
+                {'type': 'concat', 'config': {'sources': [{'type': 'rows', 'config': {'n': 3000}},
+                                                          {'type': 'rows', 'config': {'n': 2000}}]}},
+                {'type': 'filter', 'config': {'key': 'even', 'value': 'True'}},
+                {'type': 'pick', 'config': {'keys': ['id']}},
+                {'type': 'export', 'config': {'path': out_path}},
+            ]
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='spill', max_memory=64 * 1024)
+            result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+
+            expected = [{'id': i} for i in range(0, 3000, 2)] + [{'id': i} for i in range(0, 2000, 2)]
+            self.assertIsInstance(result, SpilledRecords)
+            self.assertEqual(len(result), len(expected))
+            self.assertEqual(result[1500], {'id': 0})
+            self.assertEqual(result[:2], [{'id': 0}, {'id': 2}])
+            with open(out_path) as f:
+                self.assertEqual(json.load(f), expected)
+
+            # Spilled results are cached as rows and come back as a lazy view
+            cached = PipelineRunner(steps[:3], registry, context=context).run(verbose=False)
+            self.assertIsInstance(cached, SpilledRecords)
+            self.assertEqual(list(cached), expected)
+
+            # Spilled sub-pipeline results nested in a mesh work with lookup and export
+            class Value(Block):
+                def process(self, data, context):
+                    return self.config['value']
+
+            registry.update({'mesh': Mesh, 'value': Value, 'lookup': Lookup})
+            steps = [
+                {'type': 'mesh', 'config': {'mapping': {'rows': [{'type': 'rows', 'config': {'n': 3000}}],
+                                                        'at': [{'type': 'value', 'config': {'value': 7}}]}}},
+                {'type': 'export', 'config': {'path': out_path}},
+                {'type': 'export', 'config': {'path': out_path + '.xml', 'format': 'xml'}},
+                {'type': 'lookup', 'config': {'lookup_key': 'at', 'source_key': 'rows'}},
+            ]
+            result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            self.assertEqual(result, {'id': 7, 'even': False, 'name': 'row 7'})
+            with open(out_path) as f:
+                self.assertEqual(len(json.load(f)['rows']), 3000)
+
+
+    def test_file_source_glob_reads_only_new_files(self):
+        import tpipes.sources as sources
+        with tempfile.TemporaryDirectory() as tmp:
+            for day in ('01', '02'):
+                with open(os.path.join(tmp, f'day{day}.csv'), 'w') as f:
+                    f.write(f"id,day\n1,{day}\n2,{day}\n")
+            config = {'path': os.path.join(tmp, 'day*.csv'), 'parse': 'csv', 'tag': 'file'}
+            context = PipelineContext(base_dir=tmp, pipeline_name='files')
+
+            result = FileSource({**config, 'workers': 2}).process(None, context)
+            token = FileSource(config).cache_token()
+            self.assertEqual([(r['id'], r['day']) for r in result], [('1', '01'), ('2', '01'), ('1', '02'), ('2', '02')])
+            self.assertEqual(result[0]['file'], os.path.join(tmp, 'day01.csv'))
+
+            with open(os.path.join(tmp, 'day03.csv'), 'w') as f:
+                f.write("id,day\n1,03\n")
+            self.assertNotEqual(FileSource(config).cache_token(), token)
+            with patch('tpipes.sources._parse_file', wraps=sources._parse_file) as parse:
+                result = FileSource({**config, 'workers': 1}).process(None, context)
+            self.assertEqual(parse.call_count, 1)
+            self.assertEqual(parse.call_args[0][0], os.path.join(tmp, 'day03.csv'))
+            self.assertEqual(len(result), 5)
+
+
+    def test_chunked_parallel_execution_matches_serial(self):
+        rows = ['id;note;even']
+        for i in range(12000):
+            note = f'"line one\nline ""{i}""; two"' if i % 7 == 0 else f'note {i}'
+            rows.append(f"{i};{note};{i % 2 == 0}")
+        text = "\n".join(rows) + "\n"
+
+        class Text(Block):
+            def process(self, data, context):
+                return text
+
+        steps = [{'type': 'text'}, {'type': 'csv_parser'}, {'type': 'filter', 'config': {'key': 'even', 'value': 'True'}},
+                 {'type': 'pick', 'config': {'keys': ['id', 'note']}}]
+        registry = {'text': Text, 'csv_parser': CsvParser, 'filter': Filter, 'pick': Pick}
+
+        chunks = CsvParser().split(text, 5000)
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(all(chunk.startswith('id;note;even\n') for chunk in chunks))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            serial_ctx = PipelineContext(base_dir=tmp, pipeline_name='serial', parallel_threshold=0)
+            serial = PipelineRunner(steps, registry, context=serial_ctx).run(verbose=False)
+
+            parallel_ctx = PipelineContext(base_dir=tmp, pipeline_name='parallel', parallel_threshold=1000, parallel_workers=2)
+            with patch.object(parallel_ctx, 'process_pool', wraps=parallel_ctx.process_pool) as pool:
+                parallel = PipelineRunner(steps, registry, context=parallel_ctx).run(verbose=False)
+
+        self.assertTrue(pool.called)
+        self.assertEqual(len(serial), 6000)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(serial[0], {'id': '0', 'note': 'line one\nline "0"; two'})
+
+
+    def test_dag_pipeline_shares_identical_steps_and_runs_branches_concurrently(self):
+        import threading
+        calls = []
+        barrier = threading.Barrier(2, timeout=5)
+
+        class Source(Block):
+            source = True
+
+            def process(self, data, context):
+                calls.append(self.config['name'])
+                if self.config.get('wait'):
+                    barrier.wait()  # only passes if both branches run at the same time
+                return [{'n': i, 'src': self.config['name']} for i in range(4)]
+
+        class Join(Block):
+            def process(self, data, context):
+                return {name: len(records) for name, records in data.items()}
+
+        registry = {'src': Source, 'filter': Filter, 'pick': Pick, 'join': Join}
+        steps = [
+            {'id': 'a', 'type': 'src', 'config': {'name': 'a', 'wait': True}},
+            {'id': 'evens', 'type': 'filter', 'config': {'key': 'n', 'value': '2'}},
+            {'id': 'b', 'type': 'src', 'config': {'name': 'b', 'wait': True}},
+            {'id': 'a_again', 'type': 'src', 'config': {'name': 'a', 'wait': True}},
+            {'id': 'names', 'type': 'pick', 'input': 'a_again', 'config': {'key': 'src'}},
+            {'type': 'join', 'inputs': {'evens': 'evens', 'b': 'b', 'names': 'names'}},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='dag')
+            result = PipelineRunner(steps, registry, context=context).run(verbose=False)
+            self.assertEqual(result, {'evens': 1, 'b': 4, 'names': 4})
+            self.assertEqual(sorted(calls), ['a', 'b'])
+
+            calls.clear()
+            runner = PipelineRunner(steps, registry, context=context, output='names')
+            self.assertTrue(runner.is_warm())
+            self.assertEqual(runner.run(verbose=False), ['a', 'a', 'a', 'a'])
+            self.assertEqual(calls, [])
+
+            with self.assertRaises(ValueError):
+                PipelineRunner([{'type': 'pick', 'input': 'later'}, {'id': 'later', 'type': 'src'}], registry,
+                               context=context).is_warm()
+        with self.assertRaises(loader.PipelineConfigError):
+            loader.validate_steps([{'type': 'pick', 'input': 'later'}, {'id': 'later', 'type': 'src'}], registry)
+
+
+    def test_file_source_decompresses_and_memory_maps(self):
+        import gzip, lzma
+        text = "name;city\nRené;Zürich\nAna;\"Porto\nNorte\"\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            gz_path = os.path.join(tmp, 'people.csv.gz')
+            with gzip.open(gz_path, 'wt', encoding='latin-1') as f:
+                f.write(text)
+            xz_path = os.path.join(tmp, 'people.dat')  # no extension: detected by magic bytes
+            with lzma.open(xz_path, 'wt', encoding='utf-8') as f:
+                f.write(text)
+            plain_path = os.path.join(tmp, 'people.csv')
+            with open(plain_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+            self.assertEqual(FileSource({'path': gz_path, 'encoding': 'latin-1'}).process(None, None), text)
+            self.assertEqual(FileSource({'path': xz_path, 'encoding': 'utf-8'}).process(None, None), text)
+
+            block = FileSource({'path': plain_path, 'mode': 'mmap'})
+            self.assertFalse(block.cacheable)
+            mapped = block.process(None, None)
+            rows = CsvParser().process(mapped, None)
+            self.assertEqual(rows, [{'name': 'René', 'city': 'Zürich'}, {'name': 'Ana', 'city': 'Porto\nNorte'}])
+            mapped.close()
+
+            json_path = os.path.join(tmp, 'data.json')
+            with open(json_path, 'w') as f:
+                json.dump({'ok': [1, 2]}, f)
+            mapped = FileSource({'path': json_path, 'mode': 'mmap'}).process(None, None)
+            self.assertEqual(JsonParser().process(mapped, None), {'ok': [1, 2]})
+            mapped.close()
+
+
+    def test_file_source_cache_key_tracks_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'rates.csv')
+            with open(path, 'w') as f:
+                f.write("code,rate\nEUR,1.1\n")
+            steps = [{'type': 'file_source', 'config': {'path': path}}, {'type': 'csv_parser'},
+                     {'type': 'pick', 'config': {'key': 'rate'}}]
+            registry = {'file_source': FileSource, 'csv_parser': CsvParser, 'pick': Pick}
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='rates')
+
+            self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), ['1.1'])
+            runner = PipelineRunner(steps, registry, context=context)
+            self.assertTrue(runner.is_warm())
+            with patch('tpipes.sources._read_file') as read:
+                self.assertEqual(runner.run(verbose=False), ['1.1'])
+            read.assert_not_called()
+
+            with open(path, 'w') as f:
+                f.write("code,rate\nEUR,1.2\nGBP,1.3\n")
+            self.assertFalse(runner.is_warm())
+            self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), ['1.2', '1.3'])
+
+            # A content fingerprint ignores touches that leave the bytes unchanged
+            steps[0]['config']['fingerprint'] = 'content'
+            PipelineRunner(steps, registry, context=context).run(verbose=False)
+            os.utime(path, ns=(1, 1))
+            self.assertTrue(PipelineRunner(steps, registry, context=context).is_warm())
+
+            # DAG pipelines read incremental sources in full, so the fingerprint still applies
+            steps = [{'id': 'src', 'type': 'file_source', 'config': {'path': path, 'incremental': True}},
+                     {'type': 'csv_parser', 'input': 'src'}, {'type': 'pick', 'config': {'key': 'rate'}}]
+            self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), ['1.2', '1.3'])
+            with open(path, 'a') as f:
+                f.write("USD,1.0\n")
+            self.assertEqual(PipelineRunner(steps, registry, context=context).run(verbose=False), ['1.2', '1.3', '1.0'])
+
+
+    def test_sub_pipeline_file_changes_invalidate_later_steps(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'a.csv')
+            with open(path, 'w') as f:
+                f.write("id\n1\n")
+            registry = {'file_source': FileSource, 'csv_parser': CsvParser, 'concat': Concat, 'map': Map,
+                        'pick': Pick}
+            context = PipelineContext(base_dir=tmp, block_registry=registry, pipeline_name='subs')
+            concat = [{'type': 'concat', 'config': {'sources': [{'type': 'file_source', 'config': {'path': path}}]}},
+                      {'type': 'csv_parser'}]
+            # Per-record steps read a templated path, which is only known once map runs
+            mapped = [{'type': 'file_source', 'config': {'path': os.path.join(tmp, 'ids.csv')}}, {'type': 'csv_parser'},
+                      {'type': 'map', 'config': {'steps': [{'type': 'file_source', 'config': {'path': os.path.join(tmp, '{id}.csv')}},
+                                                           {'type': 'csv_parser'}]}},
+                      {'type': 'pick', 'config': {'key': '0.id'}}]
+            with open(os.path.join(tmp, 'ids.csv'), 'w') as f:
+                f.write("id\na\n")
+
+            self.assertEqual(PipelineRunner(concat, registry, context=context).run(verbose=False), ['id\n1\n'])
+            self.assertEqual(PipelineRunner(mapped, registry, context=context).run(verbose=False), ['1'])
+            with open(path, 'w') as f:
+                f.write("id\n2\n")
+            self.assertEqual(PipelineRunner(concat, registry, context=context).run(verbose=False), ['id\n2\n'])
+            self.assertTrue(PipelineRunner(concat, registry, context=context).is_warm())
+            self.assertEqual(PipelineRunner(mapped, registry, context=context).run(verbose=False), ['2'])
+
+
 if __name__ == '__main__':
     unittest.main()
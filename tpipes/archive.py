@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from .cache import CACHE_SUFFIX, SHARED_CACHE_NAME, CacheStore, hash_file, shared_refs
+
+CACHE_ROOT = os.path.join('.', '.cache')
+# Pre-versioned `.pkl` entries are never loaded, so they are not exported or imported either
+CACHE_SUFFIXES = (CACHE_SUFFIX,)
+
+MANIFEST_NAME = "manifest.json"
+ARCHIVE_FORMAT = "tpipes-cache-archive"
+ARCHIVE_VERSION = 1
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _object_name(digest: str) -> str:
+    return f"objects/{digest[:2]}/{digest}.z"
+
+
+def _compress_file(path: str, tmp_dir: str) -> str:
+    # zlib releases the GIL on large buffers, so a thread pool gives real parallelism here.
+    comp = zlib.compressobj(6)
+    fd, out_path = tempfile.mkstemp(dir=tmp_dir, suffix=".z")
+    with open(path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+            dst.write(comp.compress(chunk))
+        dst.write(comp.flush())
+    return out_path
+
+
+def _safe_relpath(name: str) -> Optional[str]:
+    # Archive entries come from elsewhere; never let them escape the cache root.
+    norm = os.path.normpath(name)
+    if os.path.isabs(norm) or norm.startswith('..') or norm in ('.', ''):
+        return None
+    return norm
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """Read a manifest from a previous archive (.zip) or a standalone manifest (.json)."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path, 'r') as zipf:
+            if MANIFEST_NAME not in zipf.namelist():
+                raise ValueError(f"'{path}' is a legacy cache archive without a manifest")
+            return json.loads(zipf.read(MANIFEST_NAME))
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def export_cache(pipeline_name_or_path: str, output_path: str, since: str = None, workers: int = None):
+    # Determine pipeline name
+    if os.path.exists(pipeline_name_or_path):
+        pipeline_name = os.path.splitext(os.path.basename(pipeline_name_or_path))[0]
+        source_yaml_path = pipeline_name_or_path
+    else:
+        pipeline_name = pipeline_name_or_path
+        source_yaml_path = None
+
+    cache_dir = os.path.join(CACHE_ROOT, pipeline_name)
+    shared_keys = shared_refs('.', pipeline_name)
+
+    if not os.path.exists(cache_dir) and not shared_keys:
+        print(f"Error: No cache found for pipeline '{pipeline_name}' at {cache_dir}")
+        return
+
+    base_digests = set()
+    if since:
+        base = load_manifest(since)
+        base_digests = {entry['sha256'] for entry in base.get('entries', {}).values()}
+
+    print(f"Exporting cache for '{pipeline_name}' to '{output_path}'...")
+
+    # Entries are stored as <pipeline_name>/<file>, relative to the cache root
+    sources = {}
+    for root, dirs, files in os.walk(cache_dir):
+        for file in files:
+            if file.endswith(CACHE_SUFFIXES):
+                abs_path = os.path.join(root, file)
+                arcname = os.path.relpath(abs_path, CACHE_ROOT).replace(os.sep, '/')
+                sources[arcname] = abs_path
+
+    # Entries this pipeline uses from the shared cache namespace
+    shared = CacheStore(os.path.join(CACHE_ROOT, SHARED_CACHE_NAME, 'objects'))
+    for key in shared_keys:
+        abs_path = shared.path(key)
+        if os.path.exists(abs_path):
+            sources[os.path.relpath(abs_path, CACHE_ROOT).replace(os.sep, '/')] = abs_path
+
+    workers = workers or os.cpu_count() or 1
+    entries = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = dict(zip(sources, pool.map(hash_file, sources.values())))
+        for arcname, abs_path in sources.items():
+            entries[arcname] = {'sha256': digests[arcname], 'size': os.path.getsize(abs_path)}
+
+        # Content addressing: identical entries are stored once, and anything the
+        # receiving side already has (per the base manifest) is not stored at all.
+        to_store = {}
+        for arcname, digest in digests.items():
+            if digest not in base_digests and digest not in to_store:
+                to_store[digest] = sources[arcname]
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            futures = {digest: pool.submit(_compress_file, path, tmp_dir) for digest, path in to_store.items()}
+            for digest, future in futures.items():
+                compressed_path = future.result()
+                # Members are already compressed, so they go in as stored
+                info = zipfile.ZipInfo(_object_name(digest), date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                with open(compressed_path, 'rb') as src, zipf.open(info, 'w', force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                os.remove(compressed_path)
+
+            if source_yaml_path:
+                zipf.write(source_yaml_path, os.path.basename(source_yaml_path))
+                print(f"  Added source config: {os.path.basename(source_yaml_path)}")
+
+            manifest = {
+                'format': ARCHIVE_FORMAT,
+                'version': ARCHIVE_VERSION,
+                'pipeline': pipeline_name,
+                'created': time.time(),
+                'delta': bool(since),
+                'entries': entries,
+            }
+            zipf.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True))
+
+    skipped = len(entries) - sum(1 for d in set(digests.values()) if d in to_store)
+    print(f"  {len(entries)} entries, {len(to_store)} objects stored, {skipped} deduplicated or already shipped")
+    print(f"Done. Exported to {output_path}")
+
+
+def _import_object(zipf: zipfile.ZipFile, digest: str, target_path: str):
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    decomp = zlib.decompressobj()
+    h = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".part")
+    try:
+        with zipf.open(_object_name(digest), 'r') as src, os.fdopen(fd, 'wb') as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                data = decomp.decompress(chunk)
+                h.update(data)
+                dst.write(data)
+            tail = decomp.flush()
+            h.update(tail)
+            dst.write(tail)
+        if h.hexdigest() != digest:
+            raise ValueError(f"Checksum mismatch for object {digest[:12]}")
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _import_legacy(zipf: zipfile.ZipFile):
+    for file in zipf.namelist():
+        if file.endswith(".pkl"):
+            print(f"  Skipped pre-versioned pickle entry: {file}")
+        elif file.endswith(CACHE_SUFFIXES):
+            rel = _safe_relpath(file)
+            if not rel:
+                print(f"  Skipped unsafe path: {file}")
+                continue
+            target_path = os.path.join(CACHE_ROOT, rel)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with zipf.open(file, 'r') as src, open(target_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            print(f"  Imported cache: {file}")
+
+
+def import_cache(zip_path: str):
+    if not os.path.exists(zip_path):
+        print(f"Error: File '{zip_path}' not found.")
+        return
+
+    print(f"Importing cache from '{zip_path}'...")
+
+    with zipfile.ZipFile(zip_path, 'r') as zipf:
+        names = set(zipf.namelist())
+
+        if MANIFEST_NAME not in names:
+            _import_legacy(zipf)
+        else:
+            manifest = json.loads(zipf.read(MANIFEST_NAME))
+            if manifest.get('format') != ARCHIVE_FORMAT or manifest.get('version', 0) > ARCHIVE_VERSION:
+                print(f"Error: Unsupported cache archive format in '{zip_path}'")
+                return
+
+            imported = present = missing = 0
+            for arcname, entry in manifest.get('entries', {}).items():
+                rel = _safe_relpath(arcname)
+                if not rel or not rel.endswith(CACHE_SUFFIXES):
+                    print(f"  Skipped unsafe path: {arcname}")
+                    continue
+                target_path = os.path.join(CACHE_ROOT, rel)
+
+                # Some keys are rewritten in place (incremental state), so only identical bytes count
+                # as present; the size check just avoids hashing files that obviously differ
+                if os.path.exists(target_path) and os.path.getsize(target_path) == entry['size'] \
+                        and hash_file(target_path) == entry['sha256']:
+                    present += 1
+                    continue
+
+                if _object_name(entry['sha256']) not in names:
+                    print(f"  Missing from archive (delta export?): {arcname}")
+                    missing += 1
+                    continue
+
+                _import_object(zipf, entry['sha256'], target_path)
+                imported += 1
+                print(f"  Imported cache: {arcname}")
+
+            print(f"  {imported} imported, {present} already present, {missing} missing")
+
+        for file in names:
+            if file.endswith(".yaml") or file.endswith(".yml"):
+                # Extract config to current directory
+                zipf.extract(file, ".")
+                print(f"  Imported config: {file}")
+
+    print("Done.")
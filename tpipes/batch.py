@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Any, Dict, List, Tuple
+
+from rich.console import Console
+from rich.table import Table
+
+from .loader import load_pipeline, pipeline_name_from_path, uses_shared_cache
+from .runner import PipelineContext, PipelineRunner
+from .spill import parse_size
+
+
+def _run_one(path: str, block_registry: Dict[str, Any], refresh: bool, shared_cache: bool, max_memory: int,
+             parallel_threshold: int, parallel_workers: int, conn):
+    # Runs in a child process; the outcome is reported back through conn
+    if hasattr(os, 'setsid'):
+        # Lead a process group of our own, so the pool workers we start can be stopped with us
+        os.setsid()
+    try:
+        steps, options = load_pipeline(path, block_registry)
+        context = PipelineContext(block_registry=block_registry, pipeline_name=pipeline_name_from_path(path),
+                                  shared_cache=shared_cache or uses_shared_cache(options),
+                                  max_memory=max_memory or parse_size(options.get('max_memory')),
+                                  parallel_threshold=parallel_threshold if parallel_threshold is not None
+                                  else options.get('parallel_threshold'),
+                                  parallel_workers=parallel_workers)
+        PipelineRunner(steps, block_registry, context=context, output=options.get('output')).run(force_refresh=refresh, verbose=False)
+        conn.send({'status': 'ok', **context.stats})
+    except Exception as e:
+        traceback.print_exc()
+        conn.send({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def _terminate(proc: multiprocessing.Process):
+    # Stops the pipeline's whole process group: the child and any pool workers it started
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            return
+        except (ProcessLookupError, PermissionError):
+            # The child has not called setsid yet (or is gone)
+            pass
+    if proc.is_alive():
+        proc.terminate()
+
+
+def run_batch(targets: List[Tuple[str, str]], block_registry: Dict[str, Any], jobs: int = 1,
+              timeout: float = None, refresh: bool = False, shared_cache: bool = False,
+              max_memory: int = None, parallel_threshold: int = None) -> List[Dict[str, Any]]:
+    """Run (name, path) pipelines in separate processes, at most `jobs` at a time.
+
+    Each pipeline is isolated: a crash, error or timeout is recorded in its result
+    and the remaining pipelines keep running. Results are returned in input order.
+    """
+    pending = deque(targets)
+    running = {}
+    results = {}
+    # Pipelines running side by side split the cores between their process pools
+    parallel_workers = max(1, (os.cpu_count() or 1) // max(1, jobs))
+
+    def finish(name, proc, result, start):
+        proc.join(timeout=1)
+        result['name'] = name
+        result['duration'] = time.time() - start
+        results[name] = result
+
+    try:
+        while pending or running:
+            while pending and len(running) < max(1, jobs):
+                name, path = pending.popleft()
+                if not os.path.exists(path):
+                    # A stale registry entry fails on its own instead of aborting the batch
+                    results[name] = {'status': 'error', 'error': 'file not found', 'name': name, 'duration': 0.0}
+                    continue
+                parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+                # Not daemonic, so the pipeline can start process pools of its own (chunked steps, multi-file reads)
+                proc = multiprocessing.Process(target=_run_one, args=(path, block_registry, refresh, shared_cache, max_memory,
+                                                                      parallel_threshold, parallel_workers, child_conn),
+                                               name=f"tpipes-{name}")
+                proc.start()
+                child_conn.close()
+                running[name] = (proc, parent_conn, time.time())
+
+            wait([conn for _, conn, _ in running.values()] + [proc.sentinel for proc, _, _ in running.values()],
+                 timeout=0.5)
+
+            now = time.time()
+            for name, (proc, conn, start) in list(running.items()):
+                if conn.poll():
+                    try:
+                        result = conn.recv()
+                    except EOFError:
+                        _terminate(proc)
+                        result = {'status': 'crashed', 'error': f"exit code {proc.exitcode}"}
+                elif not proc.is_alive():
+                    # Pool workers of a crashed pipeline would otherwise be left behind
+                    _terminate(proc)
+                    result = {'status': 'crashed', 'error': f"exit code {proc.exitcode}"}
+                elif timeout and now - start > timeout:
+                    _terminate(proc)
+                    result = {'status': 'timeout', 'error': f"exceeded {timeout:g}s"}
+                else:
+                    continue
+                conn.close()
+                del running[name]
+                finish(name, proc, result, start)
+    except BaseException:
+        # Children would otherwise outlive an interrupted batch run
+        for proc, _, _ in running.values():
+            _terminate(proc)
+        raise
+
+    return [results[name] for name, _ in targets]
+
+
+def print_batch_summary(results: List[Dict[str, Any]]):
+    console = Console()
+    table = Table(title="Batch Run Summary")
+    table.add_column("Pipeline", style="cyan", no_wrap=True)
+    table.add_column("Status")
+    table.add_column("Duration", justify="right")
+    table.add_column("Cache hits", justify="right")
+    table.add_column("Error", style="red")
+
+    styles = {'ok': 'green', 'error': 'red', 'timeout': 'yellow', 'crashed': 'red'}
+    for r in results:
+        hits, misses = r.get('hits', 0), r.get('misses', 0)
+        total = hits + misses
+        rate = f"{hits}/{total} ({100 * hits / total:.0f}%)" if total else "-"
+        status = r['status']
+        table.add_row(r['name'], f"[{styles.get(status, 'white')}]{status}[/]", f"{r['duration']:.2f}s",
+                      rate, r.get('error', ''))
+
+    console.print(table)
+    failed = sum(1 for r in results if r['status'] != 'ok')
+    total_time = sum(r['duration'] for r in results)
+    console.print(f"{len(results) - failed}/{len(results)} succeeded, {total_time:.2f}s of pipeline time")
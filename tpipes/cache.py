@@ -0,0 +1,343 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from rich import print as rprint
+
+from .spill import SpilledRecords
+
+# On-disk layout of a cache entry (all integers little-endian):
+#   header   magic "TPC", format version, kind, codec, payload length, buffer count
+#   lengths  one u64 per out-of-band buffer (pickle entries only)
+#   payload  raw UTF-8 text, raw bytes, a protocol 5 pickle stream, or spilled rows
+#   buffers  out-of-band pickle buffers, stored uncompressed
+MAGIC = b"TPC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<3sBBBQI")
+
+KIND_STR = 1
+KIND_BYTES = 2
+KIND_PICKLE = 3
+# Row count + one pickle frame per record (see spill.py); loaded lazily, record by record
+KIND_ROWS = 4
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+
+# Structured payloads above this size are compressed if it saves at least 10%.
+# Raw text and bytes are never compressed so they can be loaded straight from an mmap.
+COMPRESS_MIN_SIZE = 64 * 1024
+
+CACHE_SUFFIX = ".tpc"
+SHARED_CACHE_NAME = "_shared"
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file's contents, read in 1 MiB chunks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class CacheFormatError(Exception):
+    pass
+
+
+class _SafeUnpickler(pickle.Unpickler):
+    # Cache entries may come from `cache import`, so only plain data types are allowed.
+    # Anything else (functions, arbitrary classes, os.system, ...) is refused.
+    ALLOWED = {
+        ('builtins', 'dict'), ('builtins', 'list'), ('builtins', 'tuple'),
+        ('builtins', 'set'), ('builtins', 'frozenset'), ('builtins', 'bytearray'),
+        ('builtins', 'bytes'), ('builtins', 'str'), ('builtins', 'int'),
+        ('builtins', 'float'), ('builtins', 'complex'), ('builtins', 'bool'),
+        ('collections', 'OrderedDict'),
+        ('datetime', 'datetime'), ('datetime', 'date'), ('datetime', 'time'),
+        ('datetime', 'timedelta'), ('datetime', 'timezone'),
+        ('decimal', 'Decimal'),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) in self.ALLOWED:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from cache")
+
+
+def safe_loads(data: bytes, buffers: List[Any] = None) -> Any:
+    return _SafeUnpickler(io.BytesIO(data), buffers=buffers).load()
+
+
+def dump_entry(path: str, data: Any):
+    """Serialize data to path atomically (write to a temp file, then rename)."""
+    buffers = []
+    codec = CODEC_NONE
+    if isinstance(data, SpilledRecords):
+        _dump_rows(path, data)
+        return
+    if type(data) is str:
+        kind, payload = KIND_STR, data.encode('utf-8')
+    elif isinstance(data, (bytes, bytearray, memoryview)):
+        kind, payload = KIND_BYTES, data
+    else:
+        kind = KIND_PICKLE
+        payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+        if len(payload) >= COMPRESS_MIN_SIZE:
+            compressed = zlib.compress(payload, 1)
+            if len(compressed) < len(payload) * 0.9:
+                payload, codec = compressed, CODEC_ZLIB
+
+    raw_buffers = [b.raw() for b in buffers]
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, kind, codec, len(payload), len(raw_buffers)))
+            for buf in raw_buffers:
+                f.write(struct.pack("<Q", buf.nbytes))
+            f.write(payload)
+            for buf in raw_buffers:
+                f.write(buf)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _dump_rows(path: str, data: SpilledRecords):
+    # Spilled results are copied over frame by frame, never loaded into memory
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, KIND_ROWS, CODEC_NONE, 0, 0))
+            data.copy_to(f)
+            length = f.tell() - HEADER.size
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, KIND_ROWS, CODEC_NONE, length, 0))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_entry(path: str) -> Any:
+    """Load an entry written by dump_entry. Raises CacheFormatError on unknown or corrupt files."""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise CacheFormatError(f"Truncated cache entry: {path}")
+        magic, version, kind, codec, length, nbuffers = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise CacheFormatError(f"Unsupported cache entry format: {path}")
+
+        buffer_lengths = [struct.unpack("<Q", f.read(8))[0] for _ in range(nbuffers)]
+        offset = HEADER.size + 8 * nbuffers
+
+        if kind == KIND_ROWS:
+            if HEADER.size + length > os.fstat(f.fileno()).st_size:
+                raise CacheFormatError(f"Truncated cache entry: {path}")
+            return SpilledRecords(path, offset, loads=safe_loads)
+
+        if codec == CODEC_ZLIB:
+            f.seek(offset)
+            payload = zlib.decompress(f.read(length))
+            return safe_loads(payload)
+        if codec != CODEC_NONE:
+            raise CacheFormatError(f"Unknown codec {codec} in cache entry: {path}")
+
+        # Uncompressed entries are decoded directly from the page cache
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if offset + length + sum(buffer_lengths) > len(mm):
+                raise CacheFormatError(f"Truncated cache entry: {path}")
+            with memoryview(mm) as view:
+                if kind == KIND_STR:
+                    return str(view[offset:offset + length], 'utf-8')
+                if kind == KIND_BYTES:
+                    return mm[offset:offset + length]
+                if kind == KIND_PICKLE:
+                    views = []
+                    pos = offset + length
+                    for n in buffer_lengths:
+                        views.append(view[pos:pos + n])
+                        pos += n
+                    try:
+                        return _SafeUnpickler(_ViewReader(view[offset:offset + length]), buffers=views).load()
+                    finally:
+                        for v in views:
+                            v.release()
+                raise CacheFormatError(f"Unknown entry kind {kind} in cache entry: {path}")
+        finally:
+            try:
+                mm.close()
+            except BufferError:
+                # Something still references the mapping; let GC close it
+                pass
+
+
+class _ViewReader:
+    """Minimal file-like reader over a memoryview, so the unpickler never copies the whole payload."""
+
+    def __init__(self, view: memoryview):
+        self.view = view
+        self.pos = 0
+
+    def read(self, n: int = -1) -> bytes:
+        end = len(self.view) if n < 0 else min(self.pos + n, len(self.view))
+        chunk = self.view[self.pos:end].tobytes()
+        self.pos = end
+        return chunk
+
+    def readinto(self, b) -> int:
+        n = min(len(b), len(self.view) - self.pos)
+        b[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def readline(self) -> bytes:
+        end = self.pos
+        while end < len(self.view) and self.view[end] != 0x0A:
+            end += 1
+        return self.read(end + 1 - self.pos)
+
+    def peek(self, n: int = 0) -> bytes:
+        return self.view[self.pos:self.pos + max(n, 1)].tobytes()
+
+
+class CacheStore:
+    """Directory of serialized step results, one file per cache key."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{CACHE_SUFFIX}")
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def load(self, key: str) -> Optional[Any]:
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return load_entry(path)
+        except (CacheFormatError, pickle.UnpicklingError, zlib.error, UnicodeDecodeError, EOFError) as e:
+            # Treat unreadable or untrusted entries as a miss; the step will be recomputed
+            rprint(f"[yellow]Ignoring cache entry {key[:8]}: {e}[/yellow]")
+            return None
+
+    def save(self, key: str, data: Any):
+        dump_entry(self.path(key), data)
+
+
+class MemoryCacheStore:
+    """LRU tier of recently used results in front of a CacheStore, for long-running processes.
+
+    Results are shared between runs, so blocks must not mutate their input in place.
+    """
+
+    def __init__(self, store: CacheStore, max_entries: int = 256):
+        self.store = store
+        self.cache_dir = store.cache_dir
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return self.store.path(key)
+
+    def exists(self, key: str) -> bool:
+        with self.lock:
+            if key in self.entries:
+                return True
+        return self.store.exists(key)
+
+    def _remember(self, key: str, data: Any):
+        with self.lock:
+            self.entries[key] = data
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def load(self, key: str) -> Optional[Any]:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        data = self.store.load(key)
+        if data is not None:
+            self._remember(key, data)
+        return data
+
+    def save(self, key: str, data: Any):
+        self.store.save(key, data)
+        self._remember(key, data)
+
+
+def prune_shared_cache(base_dir: str = ".", max_age_days: float = None, grace_seconds: float = 3600,
+                       dry_run: bool = False) -> Dict[str, Any]:
+    """Delete shared cache objects that no pipeline's refs point to.
+
+    Refs older than max_age_days (e.g. left behind by renamed pipelines) are dropped
+    first. Objects written within grace_seconds are kept, since a run that is still
+    in progress has not recorded its refs yet.
+    """
+    shared_root = os.path.join(base_dir, '.cache', SHARED_CACHE_NAME)
+    refs_dir = os.path.join(shared_root, 'refs')
+    objects_dir = os.path.join(shared_root, 'objects')
+    now = time.time()
+
+    referenced = set()
+    dropped_refs = []
+    if os.path.isdir(refs_dir):
+        for name in sorted(os.listdir(refs_dir)):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(refs_dir, name)
+            if max_age_days is not None and now - os.path.getmtime(path) > max_age_days * 86400:
+                dropped_refs.append(name[:-len('.json')])
+                if not dry_run:
+                    os.remove(path)
+                continue
+            with open(path, 'r') as f:
+                referenced.update(json.load(f).get('keys', []))
+
+    removed, freed = [], 0
+    if os.path.isdir(objects_dir):
+        for name in os.listdir(objects_dir):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(objects_dir, name)
+            stat = os.stat(path)
+            if name[:-len(CACHE_SUFFIX)] in referenced or now - stat.st_mtime < grace_seconds:
+                continue
+            removed.append(name)
+            freed += stat.st_size
+            if not dry_run:
+                os.remove(path)
+
+    return {'removed': removed, 'freed': freed, 'dropped_refs': dropped_refs, 'kept': len(referenced)}
+
+
+def shared_refs(base_dir: str, pipeline_name: str) -> List[str]:
+    """Shared cache keys recorded by the last successful run of a pipeline."""
+    path = os.path.join(base_dir, '.cache', SHARED_CACHE_NAME, 'refs', f"{pipeline_name}.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f).get('keys', [])
@@ -1,12 +1,79 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 class Block(ABC):
     cacheable = True
+    # Blocks that must run for their effect (writing files, printing) even when
+    # the runner could otherwise skip them on a warm cache.
+    side_effect = False
+    # Sources ignore their input, so in DAG pipelines they do not implicitly consume the previous step
+    source = False
+    # Record-wise blocks, where the output for old + new records equals merge(output
+    # for old, output for new), can process only the new records in incremental runs.
+    mergeable = False
+    # Mergeable blocks that can only parse new records with the input's header in front (csv_parser)
+    needs_header = False
+    # Record-wise blocks whose output for a large input equals combine() of the outputs
+    # for the pieces from split(); the runner may process those pieces on a process pool.
+    chunkable = False
+    # Blocks whose sub_pipelines() are templates filled in per input record (map), so the
+    # sources they read are only known once the block runs.
+    templated_steps = False
     
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
 
+    def has_side_effects(self, context: Any) -> bool:
+        return self.side_effect
+
+    def has_cache_token(self) -> bool:
+        """True if the output depends on state outside the config, i.e. cache_token() may not be None."""
+        return False
+
+    def cache_token(self, context: Any = None) -> Optional[str]:
+        """Extra state the step's output depends on besides its config (e.g. a file's stat), mixed into its cache key."""
+        return None
+
+    def sub_pipelines(self) -> List[List[Dict[str, Any]]]:
+        """Step lists this block runs internally (concat sources, mesh mapping, ...).
+
+        Their keys and cache tokens are part of this step's key, so a changed file read
+        by a sub-pipeline invalidates the steps after this one.
+        """
+        return []
+
+    def supports_incremental(self) -> bool:
+        """Sources return True when configured to read only what was added since the last run."""
+        return False
+
+    def delta_has_header(self) -> bool:
+        """Sources: True if each batch of new records starts with the input's header lines."""
+        return False
+
+    def read_incremental(self, state: Optional[Dict[str, Any]], context: Any) -> Tuple[Any, Dict[str, Any], bool]:
+        """Return (data, new_state, is_delta). With no usable state, read everything (is_delta False)."""
+        raise NotImplementedError(f"{type(self).__name__} does not support incremental reads")
+
+    def process_delta(self, data: Any, context: Any) -> Any:
+        """Process only the newly ingested records (incremental runs)."""
+        return self.process(data, context)
+
+    def merge(self, previous: Any, delta: Any) -> Any:
+        """Combine the stored full result with the result for new records. Raise ValueError if not possible."""
+        if isinstance(previous, list) and isinstance(delta, list):
+            return previous + delta
+        raise ValueError(f"{type(self).__name__} cannot merge {type(previous).__name__} with {type(delta).__name__}")
+
+    def split(self, data: Any, chunk_size: int) -> Optional[List[Any]]:
+        """Cut the input into pieces of about chunk_size records, or None if it cannot be split."""
+        if isinstance(data, list) and len(data) > chunk_size:
+            return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        return None
+
+    def combine(self, parts: List[Any]) -> Any:
+        """Join the outputs for the pieces from split(), in order."""
+        return [item for part in parts for item in part]
+
     @abstractmethod
     def process(self, data: Any, context: Any) -> Any:
         """Process the input data and return the result."""
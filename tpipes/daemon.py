@@ -0,0 +1,273 @@
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from .loader import load_pipeline, pipeline_name_from_path, uses_shared_cache
+from .runner import PipelineContext, PipelineRunner
+from .spill import parse_size
+
+
+class CronSchedule:
+    """Standard 5-field cron expression: minute hour day-of-month month day-of-week."""
+
+    # Day of week accepts both 0 and 7 for Sunday
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: '{expr}'")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse_field(field, lo, hi) for field, (lo, hi) in zip(fields, self.RANGES)
+        ]
+        # As in cron, if both day fields are restricted a match on either is enough
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse_field(field: str, lo: int, hi: int) -> set:
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step_str = part.split('/', 1)
+                step = int(step_str)
+            if part == '*':
+                start, end = lo, hi
+            elif '-' in part:
+                start, end = (int(p) for p in part.split('-', 1))
+            else:
+                start = end = int(part)
+            if start < lo or end > hi or start > end or step < 1:
+                raise ValueError(f"Invalid cron field '{field}'")
+            values.update(range(start, end + 1, step))
+        return {v % 7 for v in values} if hi == 7 else values
+
+    def _day_matches(self, t: datetime) -> bool:
+        weekday = (t.weekday() + 1) % 7  # cron counts from Sunday = 0
+        day_ok = t.day in self.days
+        weekday_ok = weekday in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never fires: '{self.expr}'")
+
+
+class ServedPipeline:
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.steps: List[Dict[str, Any]] = []
+        self.output: Optional[str] = None
+        self.interval: Optional[float] = None
+        self.cron: Optional[CronSchedule] = None
+        self.next_run: Optional[float] = None
+        self.mtime = None
+        self.context: Optional[PipelineContext] = None
+        # Pipeline options the context was built from; it is rebuilt when they change
+        self.context_options: Optional[tuple] = None
+        self.lock = threading.Lock()
+        self.last_result: Dict[str, Any] = {}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'path': self.path,
+            'interval': self.interval,
+            'cron': self.cron.expr if self.cron else None,
+            'next_run': datetime.fromtimestamp(self.next_run).isoformat() if self.next_run else None,
+            'running': self.lock.locked(),
+            'last_result': self.last_result,
+        }
+
+
+class PipelineDaemon:
+    """Keeps registered pipelines loaded and runs them on schedule or on request.
+
+    Parsed steps, an HTTP connection pool and an in-memory cache tier per pipeline
+    stay warm between runs. Pipeline files are reloaded when they change on disk.
+    """
+
+    def __init__(self, registry: Any, block_registry: Dict[str, Any], names: List[str] = None,
+                 default_interval: float = None, workers: int = 4, memory_cache: int = 256):
+        self.registry = registry
+        self.block_registry = block_registry
+        self.names = names
+        self.default_interval = default_interval
+        self.memory_cache = memory_cache
+        self.session = requests.Session()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pipelines: Dict[str, ServedPipeline] = {}
+        self.stop_event = threading.Event()
+        self.server = None
+
+    def load(self):
+        names = self.names or list(self.registry.pipelines.keys())
+        for name in names:
+            path = self.registry.get_pipeline_path(name)
+            if not path:
+                raise ValueError(f"Pipeline '{name}' is not registered")
+            self.pipelines[name] = ServedPipeline(name, path)
+            self._reload(self.pipelines[name])
+
+    def _reload(self, pipe: ServedPipeline):
+        mtime = os.path.getmtime(pipe.path)
+        if mtime == pipe.mtime:
+            return
+        steps, options = load_pipeline(pipe.path, self.block_registry)
+        schedule = options.get('schedule')
+        interval, cron = self.default_interval, None
+        if isinstance(schedule, (int, float)):
+            interval = float(schedule)
+        elif isinstance(schedule, str):
+            cron = CronSchedule(schedule)
+        elif isinstance(schedule, dict):
+            if 'cron' in schedule:
+                cron = CronSchedule(schedule['cron'])
+            elif 'every' in schedule:
+                interval = float(schedule['every'])
+
+        pipe.steps = steps
+        pipe.output = options.get('output')
+        pipe.interval = None if cron else interval
+        pipe.cron = cron
+        pipe.mtime = mtime
+        context_options = (uses_shared_cache(options), parse_size(options.get('max_memory')),
+                           options.get('parallel_threshold'))
+        if pipe.context is None or context_options != pipe.context_options:
+            # A new context also starts a new memory tier, so no result from the old cache namespace is served
+            shared_cache, max_memory, parallel_threshold = context_options
+            pipe.context = PipelineContext(block_registry=self.block_registry, pipeline_name=pipeline_name_from_path(pipe.path),
+                                           memory_cache=self.memory_cache, http_session=self.session,
+                                           shared_cache=shared_cache, max_memory=max_memory,
+                                           parallel_threshold=parallel_threshold)
+            pipe.context_options = context_options
+        self._schedule_next(pipe, time.time())
+
+    def _schedule_next(self, pipe: ServedPipeline, now: float):
+        if pipe.cron:
+            pipe.next_run = pipe.cron.next_after(datetime.fromtimestamp(now)).timestamp()
+        elif pipe.interval:
+            pipe.next_run = now + pipe.interval
+        else:
+            pipe.next_run = None
+
+    def run_pipeline(self, name: str, refresh: bool = False) -> Dict[str, Any]:
+        pipe = self.pipelines.get(name)
+        if pipe is None:
+            return {'status': 'error', 'error': f"Unknown pipeline '{name}'"}
+        if not pipe.lock.acquire(blocking=False):
+            return {'status': 'busy', 'error': f"Pipeline '{name}' is already running"}
+        start = time.time()
+        try:
+            self._reload(pipe)
+            runner = PipelineRunner(pipe.steps, self.block_registry, context=pipe.context, output=pipe.output)
+            runner.run(force_refresh=refresh, verbose=False)
+            result = {'status': 'ok'}
+        except Exception as e:
+            traceback.print_exc()
+            result = {'status': 'error', 'error': str(e)}
+        finally:
+            pipe.lock.release()
+        result['duration'] = round(time.time() - start, 3)
+        result['finished'] = datetime.now().isoformat()
+        pipe.last_result = result
+        print(f"[{result['finished']}] {name}: {result['status']} in {result['duration']}s")
+        return result
+
+    def _tick(self):
+        now = time.time()
+        for pipe in self.pipelines.values():
+            if pipe.next_run is not None and pipe.next_run <= now:
+                self._schedule_next(pipe, now)
+                if not pipe.lock.locked():
+                    self.executor.submit(self.run_pipeline, pipe.name)
+
+    def _next_wakeup(self) -> float:
+        due = [p.next_run for p in self.pipelines.values() if p.next_run is not None]
+        # Wake at least once a second so stop requests are noticed promptly
+        return max(0.0, min(due + [time.time() + 1.0]) - time.time())
+
+    def serve_forever(self, host: str = "127.0.0.1", port: int = 8765):
+        self.load()
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self))
+        server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        server_thread.start()
+        print(f"Serving {len(self.pipelines)} pipelines on http://{host}:{self.server.server_address[1]}")
+        try:
+            while not self.stop_event.is_set():
+                self._tick()
+                self.stop_event.wait(self._next_wakeup())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.stop_event.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+def _make_handler(daemon: PipelineDaemon):
+    class Handler(BaseHTTPRequestHandler):
+        # GET  /pipelines        -> status of every served pipeline
+        # POST /run/<name>       -> run now and return the result (?refresh=1 to bypass the cache)
+        def _reply(self, code: int, payload: Any):
+            body = json.dumps(payload, indent=2).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/pipelines':
+                self._reply(200, [p.status() for p in daemon.pipelines.values()])
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def do_POST(self):
+            path, _, query = self.path.partition('?')
+            parts = path.strip('/').split('/')
+            if len(parts) == 2 and parts[0] == 'run':
+                refresh = 'refresh=1' in query.split('&')
+                result = daemon.run_pipeline(parts[1], refresh=refresh)
+                code = {'ok': 200, 'busy': 409}.get(result['status'], 500)
+                if result.get('error', '').startswith('Unknown pipeline'):
+                    code = 404
+                self._reply(code, result)
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import pickle
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+from . import __version__
+from .cache import CacheFormatError, dump_entry, load_entry
+
+# Parsed and validated pipelines live next to the registry, one file per pipeline path
+PLAN_CACHE_DIR = ".tpipes_plans"
+
+# libyaml's loader is several times faster when PyYAML was built with it
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class PipelineConfigError(ValueError):
+    pass
+
+
+def load_config(path: str):
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+
+def pipeline_name_from_path(path: str) -> str:
+    # e.g., ./pipelines/my_pipe.yaml -> my_pipe
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def validate_steps(steps: Any, block_registry: Dict[str, Any], where: str = "steps"):
+    """Check every step (including concat/mesh sub-pipelines) names a known block type."""
+    if not isinstance(steps, list):
+        raise PipelineConfigError(f"{where}: expected a list of steps, got {type(steps).__name__}")
+    ids = set()
+    for idx, step in enumerate(steps):
+        loc = f"{where}[{idx}]"
+        if not isinstance(step, dict) or 'type' not in step:
+            raise PipelineConfigError(f"{loc}: each step needs a 'type'")
+        # DAG steps may only read from steps defined before them, which also rules out cycles
+        inputs = step.get('inputs', [step['input']] if step.get('input') is not None else [])
+        refs = inputs.values() if isinstance(inputs, dict) else inputs if isinstance(inputs, list) else None
+        if refs is None:
+            raise PipelineConfigError(f"{loc}: 'inputs' must be a mapping or a list of step ids")
+        for ref in refs:
+            if ref not in ids:
+                raise PipelineConfigError(f"{loc}: unknown input '{ref}' (inputs must name an earlier step's id)")
+        if 'id' in step:
+            if step['id'] in ids:
+                raise PipelineConfigError(f"{loc}: duplicate step id '{step['id']}'")
+            ids.add(step['id'])
+        block_cls = block_registry.get(step['type'])
+        if block_cls is None:
+            raise PipelineConfigError(f"{loc}: Unknown block type: {step['type']}")
+        config = step.get('config')
+        if config is not None and not isinstance(config, dict):
+            raise PipelineConfigError(f"{loc}: 'config' must be a mapping")
+        for sub_idx, sub_steps in enumerate(block_cls(config or {}).sub_pipelines()):
+            validate_steps(sub_steps, block_registry, f"{loc}.sub[{sub_idx}]")
+
+
+def _parse_pipeline(path: str, block_registry: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    config = load_config(path)
+
+    # Flexible config: can be list of steps or dict with 'steps'
+    options = {}
+    pipeline_steps = config
+    if isinstance(config, dict):
+        if 'steps' not in config:
+            raise PipelineConfigError("Config root must be a list of steps or a dict containing 'steps'.")
+        pipeline_steps = config['steps']
+        options = {k: v for k, v in config.items() if k != 'steps'}
+
+    if not isinstance(pipeline_steps, list):
+        raise PipelineConfigError(f"Pipeline steps must be a list, got {type(pipeline_steps)}")
+
+    if block_registry is not None:
+        validate_steps(pipeline_steps, block_registry)
+        output = options.get('output')
+        if output is not None and not any(isinstance(s, dict) and s.get('id') == output for s in pipeline_steps):
+            raise PipelineConfigError(f"output: no step has id '{output}'")
+
+    return pipeline_steps, options
+
+
+def _plan_stamp(path: str, block_registry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    st = os.stat(path)
+    registry = sorted(f"{name}={cls.__module__}.{cls.__qualname__}" for name, cls in (block_registry or {}).items())
+    return {
+        'path': os.path.abspath(path),
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'version': __version__,
+        'registry': hashlib.md5('\n'.join(registry).encode('utf-8')).hexdigest() if block_registry is not None else None,
+    }
+
+
+def load_pipeline(path: str, block_registry: Dict[str, Any] = None,
+                  plan_cache_dir: str = PLAN_CACHE_DIR) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Load a pipeline file, returning its steps and any root-level options (e.g. 'schedule').
+
+    With a block registry the steps are also validated. The result is kept in a compiled
+    plan keyed by path, mtime, size, t-pipes version and registry, so unchanged files skip
+    YAML parsing and validation entirely.
+    """
+    stamp = _plan_stamp(path, block_registry)
+    plan_path = None
+    if plan_cache_dir:
+        digest = hashlib.sha1(stamp['path'].encode('utf-8')).hexdigest()
+        plan_path = os.path.join(plan_cache_dir, f"{digest}.tpc")
+        if os.path.exists(plan_path):
+            try:
+                plan = load_entry(plan_path)
+                if isinstance(plan, dict) and plan.get('stamp') == stamp:
+                    return plan['steps'], plan['options']
+            except (CacheFormatError, pickle.UnpicklingError, zlib.error, ValueError, EOFError):
+                # An unreadable plan is just a miss
+                pass
+
+    steps, options = _parse_pipeline(path, block_registry)
+
+    if plan_path:
+        try:
+            os.makedirs(plan_cache_dir, exist_ok=True)
+            dump_entry(plan_path, {'stamp': stamp, 'steps': steps, 'options': options})
+        except OSError:
+            # A read-only working directory just means no compiled plans
+            pass
+
+    return steps, options
+
+
+def uses_shared_cache(options: Dict[str, Any]) -> bool:
+    # Root-level `cache: shared` opts a pipeline into the cross-pipeline cache namespace
+    return options.get('cache') == 'shared'
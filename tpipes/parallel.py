@@ -0,0 +1,44 @@
+import math
+from typing import Any
+
+# Inputs to chunkable blocks with more records than this (lines, for text) are split
+# up and processed on a process pool. 0 turns chunked execution off.
+DEFAULT_THRESHOLD = 100_000
+# Each worker gets a few chunks so uneven chunks still balance out, but no chunk is
+# so small that pickling it costs more than processing it.
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK = 5_000
+
+
+def input_size(data: Any) -> int:
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, str):
+        return data.count('\n') + 1
+    return 0
+
+
+def _process_chunk(block: Any, chunk: Any) -> Any:
+    # Runs in a worker process. Chunkable blocks are record-wise and need no context.
+    return block.process(chunk, None)
+
+
+def process_block(block: Any, data: Any, context: Any) -> Any:
+    """Run block on data, spreading large inputs to chunkable blocks over the context's process pool."""
+    threshold = getattr(context, 'parallel_threshold', 0)
+    workers = getattr(context, 'parallel_workers', 1)
+    if not (block.chunkable and threshold and workers > 1):
+        return block.process(data, context)
+
+    size = input_size(data)
+    if size <= threshold:
+        return block.process(data, context)
+
+    chunk_size = max(MIN_CHUNK, math.ceil(size / (workers * CHUNKS_PER_WORKER)))
+    chunks = block.split(data, chunk_size)
+    if not chunks or len(chunks) < 2:
+        return block.process(data, context)
+
+    # pool.map keeps the chunk order; each chunk is pickled once on its way to a worker
+    pool = context.process_pool()
+    return block.combine(list(pool.map(_process_chunk, [block] * len(chunks), chunks)))
@@ -1,5 +1,7 @@
+import codecs
 import json
-from typing import Any, List, Dict
+import mmap
+from typing import Any, Iterator, List, Dict
 from .core import Block
 from rich.console import Console
 from rich.table import Table
@@ -8,10 +10,40 @@ import xmltodict
 import csv
 import os
 import io
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
+from .spill import SpilledRecords, is_record_list, record_buffer
+
+def _source_steps(source_def: Any) -> List[Dict[str, Any]]:
+    # Normalizes a concat/mesh source definition (step list, 'steps' dict or single block) to a step list
+    if isinstance(source_def, list):
+        return source_def
+    if isinstance(source_def, dict):
+        if 'steps' in source_def:
+            return source_def['steps']
+        if 'type' in source_def:
+            return [source_def]
+    return []
+
+def _steps_have_side_effects(steps: List[Dict[str, Any]], context: Any) -> bool:
+    for step in steps:
+        block_cls = context.block_registry.get(step.get('type'))
+        if block_cls and block_cls(step.get('config', {})).has_side_effects(context):
+            return True
+    return False
 
 class Concat(Block):
     cacheable = False
+
+    def sub_pipelines(self) -> List[List[Dict[str, Any]]]:
+        return [_source_steps(s) for s in self.config.get('sources', [])]
+
+    def has_side_effects(self, context: Any) -> bool:
+        # Sub-pipelines may export or print, in which case the whole concat has to run
+        return any(_steps_have_side_effects(steps, context) for steps in self.sub_pipelines())
     
     def process(self, data: Any, context: Any) -> Any:
         # Concatenates results from multiple sources defined in config
@@ -22,7 +54,8 @@ class Concat(Block):
         # Delayed import to avoid circular dependency
         from .runner import PipelineRunner
         
-        result_list = []
+        # Spills to disk once it grows past the run's memory budget (if any)
+        result_list = record_buffer(context)
         
         for source_def in sources_conf:
             source_result = None
@@ -46,15 +79,21 @@ class Concat(Block):
                 source_result = block.process(None, context)
             
             # Normalize and append
-            if isinstance(source_result, list):
+            if is_record_list(source_result):
                 result_list.extend(source_result)
             elif source_result is not None:
                 result_list.append(source_result)
                 
-        return result_list
+        return result_list.result()
 
 class Mesh(Block):
     cacheable = False
+
+    def sub_pipelines(self) -> List[List[Dict[str, Any]]]:
+        return [_source_steps(s) for s in self.config.get('mapping', {}).values()]
+
+    def has_side_effects(self, context: Any) -> bool:
+        return any(_steps_have_side_effects(steps, context) for steps in self.sub_pipelines())
     
     def process(self, data: Any, context: Any) -> Any:
         # Meshes results from multiple sources into a dictionary based on mapping
@@ -97,9 +136,30 @@ class Mesh(Block):
             
         return result_dict
 
+# Raw file contents, e.g. from file_source with mode: mmap
+BYTES_LIKE = (bytes, bytearray, memoryview, mmap.mmap)
+
+def _decoded_lines(data: Any, encoding: str) -> Iterator[str]:
+    # Decodes a bytes-like buffer one line at a time, so no decoded copy of the whole input is made
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pos, size = 0, len(data)
+    while pos < size:
+        end = data.find(b'\n', pos)
+        end = size if end < 0 else end + 1
+        yield decoder.decode(data[pos:end])
+        pos = end
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
 class JsonParser(Block):
+    mergeable = True
+
     def process(self, data: Any, context: Any) -> Any:
-        if isinstance(data, str):
+        if isinstance(data, (memoryview, mmap.mmap)):
+            # json reads bytes (UTF-8/16/32) directly, without decoding to str first
+            data = bytes(data)
+        if isinstance(data, (str, bytes, bytearray)):
             try:
                 return json.loads(data)
             except json.JSONDecodeError as e:
@@ -107,9 +167,23 @@ class JsonParser(Block):
                 raise
         return data
 
+    def process_delta(self, data: Any, context: Any) -> Any:
+        # New records from an http source are whole documents. Bytes appended to a JSON file
+        # are not; they raise ValueError, so the runner re-reads the file in full instead.
+        if isinstance(data, (str, bytes, bytearray)):
+            if not data.strip():
+                return []
+            return json.loads(data)
+        return data
+
 class XmlParser(Block):
     def process(self, data: Any, context: Any) -> Any:
-        if isinstance(data, str):
+        if isinstance(data, mmap.mmap):
+            # expat reads the map in chunks through its file interface
+            data.seek(0)
+        elif isinstance(data, memoryview):
+            data = bytes(data)
+        if isinstance(data, (str, bytes, bytearray, mmap.mmap)):
             try:
                # parse to dict
                return xmltodict.parse(data)
@@ -119,56 +193,154 @@ class XmlParser(Block):
         return data
 
 class HtmlSelector(Block):
+    # A list of documents is selected from one by one, so large lists can be chunked
+    chunkable = True
+
     def process(self, data: Any, context: Any) -> Any:
         selector = self.config.get('selector')
         if not selector:
              raise ValueError("HtmlSelector requires 'selector' in config")
         
-        if not isinstance(data, str):
-             # Try to handle if it's already a bs4 object? 
-             # For now assume input is string.
-             pass
+        if is_record_list(data):
+            results = []
+            for document in data:
+                results.extend(self.process(document, context))
+            return results
 
+        if isinstance(data, (memoryview, mmap.mmap)):
+            data = bytes(data)
         soup = BeautifulSoup(data, 'lxml') 
         # Extract text from selected elements
         results = [tag.get_text(strip=True) for tag in soup.select(selector)]
         return results
 
 
+def _record_end(data: str, start: int, pos: int, quotechar: str) -> int:
+    # Index just past the first newline at or after pos that is outside a quoted field,
+    # given that start is a record boundary. Returns len(data) if there is none.
+    parity = data.count(quotechar, start, pos) % 2
+    while True:
+        newline = data.find('\n', pos)
+        if newline < 0:
+            return len(data)
+        parity ^= data.count(quotechar, pos, newline) % 2
+        if not parity:
+            return newline + 1
+        pos = newline + 1
+
 class CsvParser(Block):
+    mergeable = True
+    needs_header = True
+    chunkable = True
+
+    def _delimiter(self, data: Any) -> str:
+        delimiter = self.config.get('delimiter')
+        if delimiter:
+            return delimiter
+        # Autodetection
+        try:
+            # Sample the first few lines
+            newline = '\n' if isinstance(data, str) else b'\n'
+            end = -1
+            for _ in range(5):
+                end = data.find(newline, end + 1)
+                if end < 0:
+                    end = len(data)
+                    break
+            sample = data[:end]
+            if not isinstance(sample, str):
+                sample = bytes(sample).decode(self.config.get('encoding', 'utf-8'), errors='replace')
+            dialect = csv.Sniffer().sniff(sample)
+            return dialect.delimiter
+        except csv.Error:
+            # Fallback
+            return ','
+
+    def split(self, data: Any, chunk_size: int) -> Any:
+        # Cut the text at record boundaries (never inside a quoted field) and repeat the header in each chunk
+        if not isinstance(data, str):
+            return None
+        lines = data.count('\n') + 1
+        if lines <= chunk_size:
+            return None
+        quotechar = self.config.get('quotechar', '"')
+        # Every chunk has to be read with the same delimiter, so detect it once up front
+        self.config = {**self.config, 'delimiter': self._delimiter(data)}
+
+        header_end = _record_end(data, 0, 0, quotechar)
+        header = data[:header_end]
+        step = max(1, len(data) * chunk_size // lines)
+        chunks = []
+        pos = header_end
+        while pos < len(data):
+            end = _record_end(data, pos, min(pos + step, len(data)), quotechar)
+            chunks.append(header + data[pos:end])
+            pos = end
+        return chunks
+
     def process(self, data: Any, context: Any) -> Any:
         if not isinstance(data, str):
-            # Maybe it's already a list?
-            if isinstance(data, list):
+            # Maybe it's already a list (possibly spilled to disk)?
+            if is_record_list(data):
                  return data
-            raise ValueError("CsvParser expects a string input (or already parsed list)")
+            if not isinstance(data, BYTES_LIKE):
+                raise ValueError("CsvParser expects a string or bytes input (or already parsed list)")
+            if isinstance(data, memoryview):
+                data = bytes(data)
             
-        delimiter = self.config.get('delimiter')
+        delimiter = self._delimiter(data)
         quotechar = self.config.get('quotechar', '"')
-        
-        # Autodetection
-        if not delimiter:
-            try:
-                # Sample the first few lines
-                sample = '\n'.join(data.splitlines()[:5])
-                dialect = csv.Sniffer().sniff(sample)
-                delimiter = dialect.delimiter
-                # rprint(f"[dim]Autodetected delimiter: {repr(delimiter)}[/dim]")
-            except csv.Error:
-                # Fallback
-                delimiter = ','
                 
-        f = io.StringIO(data)
+        if isinstance(data, str):
+            f = io.StringIO(data)
+        else:
+            # Bytes (e.g. a memory-mapped file) are decoded line by line as the reader goes
+            f = _decoded_lines(data, self.config.get('encoding', 'utf-8'))
         reader = csv.DictReader(f, delimiter=delimiter, quotechar=quotechar)
         return list(reader)
 
 class Export(Block):
+    side_effect = True
     cacheable = False  # Export is a side-effect, usually we want it to run? Or maybe cache logic handles it?
                        # Actually, if we cache the output (which is the data passed through), 
                        # we might skip the file writing if we just load from cache.
                        # So Export block should NOT be effectively cached if the side effect is crucial.
                        # However, our runner logic uses `cacheable` to decide if we LOOKUP cache. 
                        # If we set cacheable=False, it runs process().
+
+    # Formats where new records can be appended to an existing file
+    APPENDABLE_FORMATS = ('csv', 'jsonl')
+
+    @property
+    def mergeable(self) -> bool:
+        # With append: true, incremental runs append only the new records
+        return bool(self.config.get('append')) and self.config.get('format', 'json').lower() in self.APPENDABLE_FORMATS
+
+    def process_delta(self, data: Any, context: Any) -> Any:
+        fmt = self.config.get('format', 'json').lower()
+        path = self.config.get('path')
+        if not path:
+             raise ValueError("Export block requires 'path'")
+        if isinstance(data, dict):
+             data = [data]
+        if not isinstance(data, list):
+             raise ValueError(f"Appending {fmt} requires a list of dicts (or a single dict)")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)) or '.', exist_ok=True)
+        if fmt == 'jsonl':
+            with open(path, 'a', encoding='utf-8') as f:
+                for item in data:
+                    f.write(json.dumps(item) + "\n")
+        elif data:
+            write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=data[0].keys())
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(data)
+
+        rprint(f"[green]Appended {len(data)} records to {path} ({fmt})[/green]")
+        return data
     
     def process(self, data: Any, context: Any) -> Any:
         # Pass-through block: returns data as-is, but writes to file.
@@ -188,15 +360,24 @@ class Export(Block):
                  # try to wrap?
                  pass
             with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+                if isinstance(data, SpilledRecords):
+                    _dump_json_stream(data, f)
+                else:
+                    json.dump(data, f, indent=2, default=_json_default)
                 
+        elif fmt == 'jsonl':
+            items = data if is_record_list(data) else [data]
+            with open(path, 'w', encoding='utf-8') as f:
+                for item in items:
+                    f.write(json.dumps(item, default=_json_default) + "\n")
+
         elif fmt == 'xml':
-            to_write = data
+            to_write = _unspill(data)
             if isinstance(data, dict):
                  if len(data.keys()) != 1:
                      to_write = {'root': data}
-            elif isinstance(data, list):
-                 to_write = {'root': {'item': data}}
+            elif is_record_list(data):
+                 to_write = {'root': {'item': to_write}}
             
             with open(path, 'w', encoding='utf-8') as f:
                 xmltodict.unparse(to_write, output=f, pretty=True)
@@ -204,13 +385,13 @@ class Export(Block):
         elif fmt == 'csv':
             if isinstance(data, dict):
                  data = [data]
-            if not isinstance(data, list):
+            if not is_record_list(data):
                  raise ValueError("CSV export requires a list of dicts (or a single dict)")
             if not data:
                  # Empty list, just create empty file
                  with open(path, 'w') as f: pass
             else:
-                 keys = data[0].keys()
+                 keys = next(iter(data)).keys()
                  with open(path, 'w', newline='', encoding='utf-8') as f:
                      writer = csv.DictWriter(f, fieldnames=keys)
                      writer.writeheader()
@@ -218,14 +399,14 @@ class Export(Block):
                      
         elif fmt == 'html':
             # Basic HTML table export
-             if not isinstance(data, list):
+             if not is_record_list(data):
                  content = f"<pre>{data}</pre>"
              else:
                  # Create a simple table
                  if not data:
                      content = "<p>No data</p>"
                  else:
-                     keys = data[0].keys()
+                     keys = next(iter(data)).keys()
                      rows = []
                      rows.append("<tr>" + "".join(f"<th>{k}</th>" for k in keys) + "</tr>")
                      for item in data:
@@ -244,13 +425,38 @@ class Export(Block):
 
 
 
+def _json_default(obj: Any) -> Any:
+    # Spilled record lists nested in a dict (mesh results, DAG inputs) are written out as lists
+    if isinstance(obj, SpilledRecords):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _unspill(data: Any) -> Any:
+    # Plain lists in place of spilled ones, for writers that only know dicts and lists
+    if isinstance(data, SpilledRecords):
+        return list(data)
+    if isinstance(data, dict):
+        return {k: _unspill(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_unspill(v) for v in data]
+    return data
+
+def _dump_json_stream(records: Any, f):
+    # Same output as json.dump(list(records), f, indent=2), one record at a time
+    first = True
+    for record in records:
+        f.write("[\n" if first else ",\n")
+        f.write("\n".join("  " + line for line in json.dumps(record, indent=2).splitlines()))
+        first = False
+    f.write("[]" if first else "\n]")
+
 def get_nested_value(data: Any, path: str) -> Any:
     keys = path.split('.')
     current = data
     for k in keys:
         if isinstance(current, dict):
             current = current.get(k)
-        elif isinstance(current, list):
+        elif is_record_list(current):
             # Optional: handle list index access like users.0.name?
             # For simplicity, let's stick to dict keys for now, or maybe simple integer support
             try:
@@ -269,17 +475,20 @@ def get_nested_value(data: Any, path: str) -> Any:
     return current
 
 class Filter(Block):
+    mergeable = True
+    chunkable = True
+
     def process(self, data: Any, context: Any) -> Any:
         # Expects specific structure: list of dicts
         key = self.config.get('key')
         value = self.config.get('value')
         op = self.config.get('op', 'eq') # eq, contains, exists
         
-        if not isinstance(data, list):
+        if not is_record_list(data):
             # If it's a dict, maybe we filter keys? For now assume list of items
             return data 
             
-        filtered = []
+        filtered = record_buffer(context)
         for item in data:
             if not isinstance(item, (dict, list)):
                 continue
@@ -301,9 +510,12 @@ class Filter(Block):
             elif op == 'contains':
                 if str(value).lower() in str(item_val).lower():
                      filtered.append(item)
-        return filtered
+        return filtered.result()
 
 class Pick(Block):
+    mergeable = True
+    chunkable = True
+
     def process(self, data: Any, context: Any) -> Any:
         # Extracts specific fields from the data
         # config: key (string) or keys (list of strings)
@@ -324,34 +536,41 @@ class Pick(Block):
 
         if isinstance(data, list):
             return [extract(item) for item in data]
+        elif isinstance(data, SpilledRecords):
+            picked = record_buffer(context)
+            picked.extend(extract(item) for item in data)
+            return picked.result()
         elif isinstance(data, (dict, list)):
             return extract(data)
         
         return data
 
 class Print(Block):
+    side_effect = True
     cacheable = False
     
     def process(self, data: Any, context: Any) -> Any:
         console = Console()
         console.rule("[bold green]Step Output")
         
-        if isinstance(data, list) and data and isinstance(data[0], dict):
+        # Only the first rows are read, so spilled results are never loaded in full
+        head = data[:10] if is_record_list(data) else None
+        if head and isinstance(head[0], dict):
             # Debugging check
-            rprint(f"[dim]Data type: {type(data)}, Item type: {type(data[0])}[/dim]")
+            rprint(f"[dim]Data type: {type(data)}, Item type: {type(head[0])}[/dim]")
             if len(data) > 0:
-                 rprint(f"[dim]Keys: {list(data[0].keys())}[/dim]")
+                 rprint(f"[dim]Keys: {list(head[0].keys())}[/dim]")
 
             # Print table
             table = Table(show_header=True, header_style="bold magenta")
             # Dynamic columns based on first item keys
             # Limit number of columns to avoid messy wrap
-            keys = list(data[0].keys())[:8] 
+            keys = list(head[0].keys())[:8] 
             
             for key in keys:
                 table.add_column(str(key))
             
-            for item in data[:10]: # Limit to 10 for view
+            for item in head: # Limit to 10 for view
                 row = [str(item.get(k, '')) for k in keys]
                 table.add_row(*row)
                 
@@ -383,14 +602,14 @@ class Lookup(Block):
              # rprint(f"[red]Source container not found at {source_path}[/red]")
              return None
              
-        if not isinstance(source_container, (dict, list)):
+        if not isinstance(source_container, dict) and not is_record_list(source_container):
              raise ValueError(f"Source container at '{source_path}' must be dict or list. Got {type(source_container)}")
              
         try:
             if isinstance(source_container, dict):
                  # key_val might be int or str
                  return source_container.get(str(key_val))
-            elif isinstance(source_container, list):
+            elif is_record_list(source_container):
                  idx = int(key_val)
                  if 0 <= idx < len(source_container):
                      return source_container[idx]
@@ -399,3 +618,109 @@ class Lookup(Block):
             return None
             
         return None
+
+
+_TEMPLATE_FIELD = re.compile(r"\{([^{}]+)\}")
+
+def render_template(template: Any, record: Any) -> Any:
+    """Fill {field} placeholders (nested keys allowed, e.g. {user.id}) from a record.
+
+    A string that is exactly one placeholder takes the raw value, so types survive.
+    {item} refers to the whole record unless the record has an 'item' key.
+    """
+    def lookup(name: str) -> Any:
+        value = get_nested_value(record, name) if isinstance(record, (dict, list)) else None
+        if value is None and name == 'item':
+            value = record
+        if value is None:
+            raise ValueError(f"Map template field '{name}' not found in record")
+        return value
+
+    if isinstance(template, dict):
+        return {k: render_template(v, record) for k, v in template.items()}
+    if isinstance(template, list):
+        return [render_template(v, record) for v in template]
+    if isinstance(template, str):
+        whole = _TEMPLATE_FIELD.fullmatch(template)
+        if whole:
+            return lookup(whole.group(1))
+        return _TEMPLATE_FIELD.sub(lambda m: str(lookup(m.group(1))), template)
+    return template
+
+class _RateLimiter:
+    # Spaces out calls to at most `per_second`, shared by all worker threads
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class Map(Block):
+    cacheable = False  # Each item's sub-pipeline is cached on its own
+    templated_steps = True
+
+    ERROR_POLICIES = ('fail', 'skip', 'null')
+
+    def sub_pipelines(self) -> List[List[Dict[str, Any]]]:
+        return [self.config.get('steps', [])]
+
+    def has_side_effects(self, context: Any) -> bool:
+        return _steps_have_side_effects(self.config.get('steps', []), context)
+
+    def process(self, data: Any, context: Any) -> Any:
+        # Runs the templated 'steps' once per input record, on a bounded worker pool
+        steps = self.config.get('steps')
+        if not steps:
+            raise ValueError("Map block requires 'steps'")
+        if data is None:
+            return []
+        if not is_record_list(data):
+            raise ValueError("Map block expects a list of records")
+
+        workers = int(self.config.get('workers', 4))
+        on_error = self.config.get('on_error', 'fail')
+        if on_error not in self.ERROR_POLICIES:
+            raise ValueError(f"Map 'on_error' must be one of {', '.join(self.ERROR_POLICIES)}")
+        into = self.config.get('into')
+        rate_limit = self.config.get('rate_limit')
+        limiter = _RateLimiter(float(rate_limit)) if rate_limit else None
+
+        from .runner import PipelineRunner
+
+        def run_item(record):
+            try:
+                runner = PipelineRunner(render_template(steps, record), context.block_registry, context=context)
+                # Items served entirely from cache do not count against the rate limit
+                if limiter and not runner.is_warm():
+                    limiter.wait()
+                return True, runner.run(verbose=False)
+            except Exception as e:
+                if on_error == 'fail':
+                    raise
+                rprint(f"[yellow]Map item failed ({on_error}): {e}[/yellow]")
+                return False, None
+
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            # pool.map keeps results in input order
+            outcomes = list(pool.map(run_item, data))
+        finally:
+            # With on_error: fail, items not started yet are dropped
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        results = []
+        for record, (ok, value) in zip(data, outcomes):
+            if not ok and on_error == 'skip':
+                continue
+            if into and isinstance(record, dict):
+                results.append({**record, into: value})
+            else:
+                results.append(value)
+        return results
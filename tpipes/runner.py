@@ -1,86 +1,374 @@
 import hashlib
-import pickle
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from .core import Block
+from .cache import CacheStore, MemoryCacheStore, SHARED_CACHE_NAME
+from .spill import SpilledRecords, spill_if_large
+from .parallel import DEFAULT_THRESHOLD, process_block
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import importlib
+import threading
+
+# _step_token result for steps whose output cannot be keyed before they run
+VOLATILE = object()
 
 class PipelineContext:
-    def __init__(self, base_dir: str = ".", block_registry: Dict[str, Any] = None, pipeline_name: str = "default"):
+    def __init__(self, base_dir: str = ".", block_registry: Dict[str, Any] = None, pipeline_name: str = "default",
+                 memory_cache: int = 0, http_session: Any = None, shared_cache: bool = False,
+                 max_memory: int = None, parallel_threshold: int = None, parallel_workers: int = None):
         self.base_dir = base_dir
         self.pipeline_name = pipeline_name
         self.cache_dir = os.path.join(base_dir, '.cache', pipeline_name)
+        self.refs_path = None
+        if shared_cache:
+            # Results are keyed only by block type, config and upstream key, so pipelines
+            # can share them; each pipeline records the keys it uses so pruning stays safe
+            shared_root = os.path.join(base_dir, '.cache', SHARED_CACHE_NAME)
+            self.cache_dir = os.path.join(shared_root, 'objects')
+            self.refs_path = os.path.join(shared_root, 'refs', f"{pipeline_name}.json")
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
+        self.cache = CacheStore(self.cache_dir)
+        if memory_cache:
+            # Long-running processes keep recent results in memory as well
+            self.cache = MemoryCacheStore(self.cache, max_entries=memory_cache)
         self.block_registry = block_registry or {}
+        # Shared requests.Session, so repeated runs reuse pooled connections
+        self.http_session = http_session
+        # Memory budget in bytes: larger intermediate results are spilled to disk as lazy views
+        self.max_memory = max_memory
+        self.spill_dir = os.path.join(base_dir, '.cache', '_spill')
+        # Chunkable steps with more input records than the threshold run on a process pool
+        self.parallel_threshold = DEFAULT_THRESHOLD if parallel_threshold is None else parallel_threshold
+        self.parallel_workers = parallel_workers or os.cpu_count() or 1
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+        self.used_keys = set()
+        self.force_refresh = False
+        # Scratch space for blocks during a run (None outside one), e.g. paginated records
+        # read while computing a cache token
+        self.run_memo = None
+        self._run_depth = 0
+
+    def record_cache(self, hit: bool):
+        with self._stats_lock:
+            self.stats['hits' if hit else 'misses'] += 1
+
+    def use_key(self, key: str):
+        with self._stats_lock:
+            self.used_keys.add(key)
+
+    def begin_run(self, force_refresh: bool = False):
+        with self._stats_lock:
+            if self._run_depth == 0:
+                self.used_keys = set()
+                self.run_memo = {}
+                # Blocks with their own caches (e.g. paginated sources) honour the top-level --refresh
+                self.force_refresh = force_refresh
+            self._run_depth += 1
+
+    def process_pool(self) -> ProcessPoolExecutor:
+        # Started on first use and kept for the rest of the run
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.parallel_workers)
+            return self._pool
+
+    def end_run(self, success: bool = True):
+        with self._stats_lock:
+            self._run_depth -= 1
+            done = self._run_depth == 0
+        if done:
+            self.run_memo = None
+            with self._pool_lock:
+                pool, self._pool = self._pool, None
+            if pool:
+                pool.shutdown(wait=True)
+        # A failed run keeps the previous refs, so it cannot unpin results a good run needed
+        if done and success and self.refs_path:
+            self._save_refs()
+
+    def _save_refs(self):
+        os.makedirs(os.path.dirname(self.refs_path), exist_ok=True)
+        tmp_path = f"{self.refs_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'pipeline': self.pipeline_name, 'keys': sorted(self.used_keys)}, f)
+        os.replace(tmp_path, self.refs_path)
 
 class PipelineRunner:
-    def __init__(self, pipeline_config: List[Dict[str, Any]], block_registry: Dict[str, Any], pipeline_name: str = "default", context: PipelineContext = None):
+    # Independent steps of a DAG pipeline that may run at the same time
+    DAG_WORKERS = 8
+
+    def __init__(self, pipeline_config: List[Dict[str, Any]], block_registry: Dict[str, Any], pipeline_name: str = "default",
+                 context: PipelineContext = None, output: str = None):
         self.config = pipeline_config
+        # DAG pipelines: id of the step whose output run() returns (default: the last step)
+        self.output = output
         # reuse context if provided (for sub-pipelines), else create new
         self.context = context or PipelineContext(block_registry=block_registry, pipeline_name=pipeline_name)
         self.block_registry = block_registry
+        # Keys whose cached results cannot be trusted because an upstream step's output is not
+        # determined by its config (see _step_token); the planner never loads them
+        self._volatile = set()
 
-    def _get_cache_key(self, block_name: str, config: Dict, input_data: Any) -> str:
-        """Generate a unique hash for the block execution."""
-        # We assume input_data is hashable or serializable to string for hashing
-        # For simplicity in this POC, we'll try to execute consistent string representation
-        try:
-            input_str = str(input_data)
-        except Exception:
-            # Fallback for un-stringifiable data (though most should be)
-            input_str = str(id(input_data)) 
-        
-        content = f"{block_name}{json.dumps(config, sort_keys=True)}{input_str}"
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+    def _get_cache_key(self, block_name: str, config: Dict, parent_key: str, token: Optional[str] = None) -> str:
+        """Generate a unique hash for the block execution.
+
+        The key is derived from the upstream step's key rather than its output, so the
+        keys of a whole pipeline are known before any step runs or any data is loaded.
+        A block's cache token (e.g. a source file's stat) is folded in when it has one.
+        """
+        content = f"{parent_key}{block_name}{json.dumps(config, sort_keys=True, default=str)}"
+        key = hashlib.md5(content.encode('utf-8')).hexdigest()
+        if token is not None:
+            key = hashlib.md5(f"{key}{token}".encode('utf-8')).hexdigest()
+        return key
 
     def _load_cache(self, key: str) -> Any:
-        cache_path = os.path.join(self.context.cache_dir, f"{key}.pkl")
-        if os.path.exists(cache_path):
-            with open(cache_path, 'rb') as f:
-                return pickle.load(f)
-        return None
+        return self.context.cache.load(key)
 
     def _save_cache(self, key: str, data: Any):
-        cache_path = os.path.join(self.context.cache_dir, f"{key}.pkl")
-        with open(cache_path, 'wb') as f:
-            pickle.dump(data, f)
+        self.context.cache.save(key, data)
 
-    def run(self, force_refresh: bool = False, verbose: bool = True):
-        current_data = None
-        
-        for step_idx, step_conf in enumerate(self.config):
+    def _build_blocks(self) -> List[Block]:
+        blocks = []
+        for step_conf in self.config:
             block_type = step_conf.get('type')
-            block_config = step_conf.get('config', {})
-            
             if block_type not in self.block_registry:
                 raise ValueError(f"Unknown block type: {block_type}")
-            
-            block_cls = self.block_registry[block_type]
-            block = block_cls(block_config)
-            
+            blocks.append(self.block_registry[block_type](step_conf.get('config', {})))
+        return blocks
+
+    def _plan(self, blocks: List[Block], keys: List[str], force_refresh: bool) -> List[str]:
+        """Decide per step whether to 'run' it, 'load' its cached output, or 'skip' it.
+
+        Walking backwards from the last step (whose output is returned), a cached step
+        only needs loading if something downstream consumes its output; everything
+        upstream of it can be skipped unless it has side effects (export, print, ...).
+        """
+        actions = [None] * len(blocks)
+        needed = True
+        for idx in reversed(range(len(blocks))):
+            block = blocks[idx]
+            cached = block.cacheable and not force_refresh and keys[idx] not in self._volatile \
+                and self.context.cache.exists(keys[idx])
+            if cached:
+                actions[idx] = 'load' if needed else 'skip'
+                needed = False
+            elif needed or block.has_side_effects(self.context):
+                actions[idx] = 'run'
+                needed = True
+            else:
+                actions[idx] = 'skip'
+                needed = False
+        return actions
+
+    def _materialize(self, blocks: List[Block], keys: List[str], idx: int, initial_data: Any = None) -> Any:
+        # Slow path when a planned cache load fails (e.g. a corrupt or rejected entry):
+        # rebuild the output of step idx from whatever upstream results are loadable.
+        if idx < 0:
+            return initial_data
+        block = blocks[idx]
+        if block.cacheable:
+            data = self._load_cache(keys[idx])
+            if data is not None:
+                return data
+        data = process_block(block, self._materialize(blocks, keys, idx - 1, initial_data), self.context)
+        if block.cacheable and data is not None:
+            self._save_cache(keys[idx], data)
+        return data
+
+    def _step_token(self, block: Block) -> Any:
+        """The block's cache token, extended with the keys of any sub-pipelines it runs.
+
+        Concat, mesh and map are not cached themselves, so without this a file changed
+        inside one of their sub-pipelines would leave the keys of the steps after them
+        unchanged. Returns VOLATILE when the output cannot be keyed up front: a map whose
+        per-record steps read sources with their own tokens (e.g. templated file paths).
+        """
+        token = block.cache_token(self.context)
+        sub_pipelines = block.sub_pipelines()
+        if not sub_pipelines:
+            return token
+        sub_keys = []
+        for steps in sub_pipelines:
+            classes = [self.block_registry.get(step.get('type')) for step in steps]
+            if not all(classes):
+                # Unknown sub-steps are reported and skipped when the block runs
+                sub_keys.append(None)
+                continue
+            sub_blocks = [cls(step.get('config', {})) for cls, step in zip(classes, steps)]
+            if block.templated_steps and any(self._reads_external_state(b) for b in sub_blocks):
+                return VOLATILE
+            keys = self._chain_keys(steps, sub_blocks)
+            if keys and keys[-1] in self._volatile:
+                return VOLATILE
+            sub_keys.append(keys[-1] if keys else None)
+        return json.dumps([token, sub_keys])
+
+    def _reads_external_state(self, block: Block) -> bool:
+        # Without computing any token (templated steps cannot be read before they are filled in)
+        if block.has_cache_token():
+            return True
+        for steps in block.sub_pipelines():
+            for step in steps:
+                block_cls = self.block_registry.get(step.get('type'))
+                if block_cls and self._reads_external_state(block_cls(step.get('config', {}))):
+                    return True
+        return False
+
+    def _chain_keys(self, steps: List[Dict[str, Any]], blocks: List[Block], parent_key: str = "",
+                    incremental: bool = False) -> List[str]:
+        # An incremental source tracks its own position, so its token stays out of the keys
+        # its state and merged results are stored under
+        keys = []
+        volatile = parent_key in self._volatile
+        for idx, (step_conf, block) in enumerate(zip(steps, blocks)):
+            token = None if incremental and idx == 0 else self._step_token(block)
+            if token is VOLATILE:
+                volatile, token = True, None
+            parent_key = self._get_cache_key(step_conf.get('type'), step_conf.get('config', {}), parent_key, token)
+            if volatile:
+                self._volatile.add(parent_key)
+            keys.append(parent_key)
+        return keys
+
+    def is_warm(self, force_refresh: bool = False) -> bool:
+        """True if a run would only read cached results and run side-effect blocks."""
+        blocks = self._build_blocks()
+        if self.is_dag():
+            graph = self._dag_graph(blocks)
+            actions = self._dag_plan(blocks, graph, force_refresh)
+            return not any(action == 'run' and not blocks[graph['first'][key]].side_effect
+                           for key, action in actions.items())
+        if blocks and blocks[0].supports_incremental():
+            return False
+        actions = self._plan(blocks, self._chain_keys(self.config, blocks), force_refresh)
+        return not any(action == 'run' and not block.side_effect for action, block in zip(actions, blocks))
+
+    def run(self, force_refresh: bool = False, verbose: bool = True):
+        self.context.begin_run(force_refresh)
+        try:
+            result = self._run(force_refresh, verbose)
+        except BaseException:
+            self.context.end_run(success=False)
+            raise
+        self.context.end_run()
+        return result
+
+    def _run(self, force_refresh: bool, verbose: bool):
+        blocks = self._build_blocks()
+        if self.is_dag():
+            return self._run_dag(blocks, force_refresh, verbose)
+        if blocks and blocks[0].supports_incremental():
+            keys = self._chain_keys(self.config, blocks, incremental=True)
+            return self._run_incremental(blocks, keys, force_refresh, verbose)
+        return self._execute(blocks, self._chain_keys(self.config, blocks), force_refresh, verbose)
+
+    def _run_incremental(self, blocks: List[Block], keys: List[str], force_refresh: bool, verbose: bool,
+                         reset: bool = False):
+        """Run a pipeline whose source can read only records added since the last run.
+
+        The new records flow through the leading run of mergeable blocks, and each of
+        those merges its delta into the full result it stored last time. The remaining
+        steps then run normally on the merged result, with cache keys that include the
+        source's watermark so they never serve results from before the new records.
+        """
+        source = blocks[0]
+        merged = 1
+        while merged < len(blocks) and blocks[merged].mergeable:
+            if blocks[merged].needs_header and not source.delta_has_header():
+                if verbose:
+                    print(f"Note: {self.config[merged].get('type')} needs header_lines on the source to merge new records")
+                break
+            merged += 1
+
+        # The watermark is stored with the merged results, under the last merged step's key:
+        # chains reading the same source (mesh branches, shared caches) each advance their own
+        state_key = f"inc-{keys[merged - 1]}"
+        stored = None
+        if not (force_refresh or reset) and merged > 1:
+            # Without a mergeable step there is nothing to merge new records into, so always read in full
+            stored = self._load_cache(state_key)
+            if not isinstance(stored, dict) or len(stored.get('results') or []) != merged - 1:
+                stored = None
+
+        if verbose:
+            print(f"[1] Running {self.config[0].get('type')} (incremental)...")
+        delta, source_state, is_delta = source.read_incremental(stored['source'] if stored else None, self.context)
+        if verbose:
+            print("  -> Read new records only" if is_delta else "  -> Read in full", end="")
+            self._print_summary(delta)
+
+        full = delta
+        results = []
+        for idx in range(1, merged):
+            block = blocks[idx]
             if verbose:
-                print(f"[{step_idx+1}] Running {block_type}...")
-            
-            # Caching Logic
-            cache_key = self._get_cache_key(block_type, block_config, current_data)
-            
-            # Default to not using cache if block says so
-            should_cache = block.cacheable
-            cached_result = None
-
-            if should_cache:
-                cached_result = self._load_cache(cache_key)
-            
-            if cached_result is not None and not force_refresh:
+                print(f"[{idx+1}] Running {self.config[idx].get('type')} (incremental)...")
+            if not is_delta:
+                delta = full = block.process(full, self.context)
+            else:
+                try:
+                    delta = block.process_delta(delta, self.context)
+                    full = block.merge(stored['results'][idx - 1], delta)
+                except ValueError as e:
+                    if verbose:
+                        print(f"  -> Cannot merge ({e}); reprocessing in full")
+                    return self._run_incremental(blocks, keys, force_refresh, verbose, reset=True)
+            results.append(full)
+            if verbose:
+                print(f"  -> Merged {'new records' if is_delta else 'full input'}", end="")
+                self._print_summary(full)
+
+        if merged > 1:
+            self.context.use_key(state_key)
+            self._save_cache(state_key, {'source': source_state, 'results': results})
+
+        watermark = hashlib.md5(json.dumps(source_state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        parent_key = self._get_cache_key('incremental', {'watermark': watermark}, keys[merged - 1])
+        tail_keys = self._chain_keys(self.config[merged:], blocks[merged:], parent_key)
+        return self._execute(blocks[merged:], tail_keys, force_refresh, verbose, initial_data=full, offset=merged)
+
+    def _execute(self, blocks: List[Block], keys: List[str], force_refresh: bool, verbose: bool,
+                 initial_data: Any = None, offset: int = 0):
+        actions = self._plan(blocks, keys, force_refresh)
+        current_data = initial_data
+
+        for step_idx, (block, cache_key, action) in enumerate(zip(blocks, keys, actions)):
+            block_type = self.config[offset + step_idx].get('type')
+            step_no = offset + step_idx + 1
+            if block.cacheable:
+                self.context.use_key(cache_key)
+
+            if action == 'skip':
+                if block.cacheable:
+                    self.context.record_cache(True)
                 if verbose:
+                    print(f"[{step_no}] Skipping {block_type} (cached downstream)")
+                continue
+
+            if verbose:
+                print(f"[{step_no}] Running {block_type}...")
+
+            if action == 'load':
+                cached_result = self._load_cache(cache_key)
+                self.context.record_cache(cached_result is not None)
+                if cached_result is None:
+                    cached_result = self._materialize(blocks, keys, step_idx, initial_data)
+                elif verbose:
                     print(f"  -> Used cache: {cache_key[:8]}", end="")
                     self._print_summary(cached_result)
-                current_data = cached_result
+                current_data = spill_if_large(cached_result, self.context)
             else:
-                current_data = block.process(current_data, self.context)
-                if should_cache:
+                current_data = spill_if_large(process_block(block, current_data, self.context), self.context)
+                if block.cacheable:
+                    self.context.record_cache(False)
+                if block.cacheable and current_data is not None:
                     self._save_cache(cache_key, current_data)
                     if verbose:
                         print(f"  -> Executed and cached: {cache_key[:8]}", end="")
@@ -92,10 +380,185 @@ class PipelineRunner:
 
         return current_data
 
+    def is_dag(self) -> bool:
+        """Pipelines where any step has an 'id' or names its inputs run as a DAG."""
+        return any(isinstance(step, dict) and ('id' in step or 'input' in step or 'inputs' in step)
+                   for step in self.config)
+
+    def _dag_graph(self, blocks: List[Block]) -> Dict[str, Any]:
+        """Resolve step inputs to cache keys.
+
+        A step's input is 'input: <id>', 'inputs: {name: <id>}' (passed as a dict) or
+        'inputs: [<id>, ...]' (passed as a list). Without either, a step takes the previous
+        step's output, except sources and the first step. Keys cover block type, config and
+        input keys, so steps that compute the same thing share a key and run once.
+        """
+        ids, keys, specs = {}, [], []
+        for idx, (step, block) in enumerate(zip(self.config, blocks)):
+            where = f"Step {idx + 1} ({step.get('type')})"
+
+            def ref(name):
+                if name not in ids:
+                    raise ValueError(f"{where}: unknown input '{name}' (inputs must name an earlier step's id)")
+                return ids[name]
+
+            if 'inputs' in step:
+                inputs = step['inputs']
+                if isinstance(inputs, dict):
+                    spec = {name: ref(step_id) for name, step_id in inputs.items()}
+                elif isinstance(inputs, list):
+                    spec = [ref(step_id) for step_id in inputs]
+                else:
+                    raise ValueError(f"{where}: 'inputs' must be a mapping or a list of step ids")
+            elif 'input' in step:
+                spec = ref(step['input']) if step['input'] is not None else None
+            elif idx == 0 or block.source:
+                spec = None
+            else:
+                spec = keys[-1]
+
+            parent_key = json.dumps(spec, sort_keys=True) if isinstance(spec, (dict, list)) else (spec or "")
+            token = self._step_token(block)
+            key = self._get_cache_key(step.get('type'), step.get('config', {}), parent_key,
+                                      None if token is VOLATILE else token)
+            spec_keys = spec.values() if isinstance(spec, dict) else spec if isinstance(spec, list) else [spec]
+            if token is VOLATILE or any(dep in self._volatile for dep in spec_keys):
+                self._volatile.add(key)
+            if 'id' in step:
+                if step['id'] in ids:
+                    raise ValueError(f"{where}: duplicate step id '{step['id']}'")
+                ids[step['id']] = key
+            keys.append(key)
+            specs.append(spec)
+
+        if self.output is not None and self.output not in ids:
+            raise ValueError(f"Unknown output step id '{self.output}'")
+        first = {}
+        for idx, key in enumerate(keys):
+            first.setdefault(key, idx)
+        deps = {}
+        for key, idx in first.items():
+            spec = specs[idx]
+            deps[key] = list(spec.values()) if isinstance(spec, dict) else spec if isinstance(spec, list) else [spec] if spec else []
+        return {
+            'keys': keys, 'specs': specs, 'first': first, 'deps': deps,
+            'output': ids[self.output] if self.output is not None else (keys[-1] if keys else None),
+        }
+
+    def _dag_plan(self, blocks: List[Block], graph: Dict[str, Any], force_refresh: bool) -> Dict[str, str]:
+        # As _plan, per distinct step: walking back from the output, only steps whose
+        # result something downstream runs on are loaded or run (plus side-effect steps)
+        needed = {graph['output']}
+        actions = {}
+        for key in reversed(list(graph['first'])):
+            block = blocks[graph['first'][key]]
+            cached = block.cacheable and not force_refresh and key not in self._volatile \
+                and self.context.cache.exists(key)
+            if cached:
+                actions[key] = 'load' if key in needed else 'skip'
+            elif key in needed or block.has_side_effects(self.context):
+                actions[key] = 'run'
+                needed.update(graph['deps'][key])
+            else:
+                actions[key] = 'skip'
+        return actions
+
+    @staticmethod
+    def _dag_input(spec: Any, results: Dict[str, Any]) -> Any:
+        if spec is None:
+            return None
+        if isinstance(spec, dict):
+            return {name: results[key] for name, key in spec.items()}
+        if isinstance(spec, list):
+            return [results[key] for key in spec]
+        return results[spec]
+
+    def _run_dag(self, blocks: List[Block], force_refresh: bool, verbose: bool):
+        graph = self._dag_graph(blocks)
+        first, deps = graph['first'], graph['deps']
+        actions = self._dag_plan(blocks, graph, force_refresh)
+        results: Dict[str, Any] = {}
+        results_lock = threading.Lock()
+
+        def label(idx: int) -> str:
+            step = self.config[idx]
+            return f"[{idx + 1}] {step.get('type')}" + (f" ({step['id']})" if 'id' in step else "")
+
+        if verbose:
+            for idx, key in enumerate(graph['keys']):
+                if first[key] != idx:
+                    print(f"{label(idx)}: same as step {first[key] + 1}, runs once")
+
+        def compute(key: str, action: str) -> Any:
+            idx = first[key]
+            block = blocks[idx]
+            if action == 'load':
+                data = self._load_cache(key)
+                self.context.record_cache(data is not None)
+                if data is not None:
+                    if verbose:
+                        print(f"{label(idx)}: used cache {key[:8]}", end="")
+                        self._print_summary(data)
+                    return spill_if_large(data, self.context)
+            with results_lock:
+                missing = [dep for dep in deps[key] if dep not in results]
+            # Only after a failed load: upstream steps planned as skipped are needed after all
+            for dep in missing:
+                value = compute(dep, 'load' if blocks[first[dep]].cacheable else 'run')
+                with results_lock:
+                    results[dep] = value
+            with results_lock:
+                data_in = self._dag_input(graph['specs'][idx], results)
+            data = spill_if_large(process_block(block, data_in, self.context), self.context)
+            if block.cacheable:
+                self.context.record_cache(False)
+                if data is not None:
+                    self._save_cache(key, data)
+            if verbose:
+                print(f"{label(idx)}: executed", end="")
+                self._print_summary(data)
+            return data
+
+        skipped = object()
+
+        def execute(key: str) -> Any:
+            if blocks[first[key]].cacheable:
+                self.context.use_key(key)
+            if actions[key] == 'skip':
+                if blocks[first[key]].cacheable:
+                    self.context.record_cache(True)
+                return skipped
+            return compute(key, actions[key])
+
+        # Results are dropped once every step reading them has run
+        readers = Counter(dep for key in first for dep in deps[key])
+        pending = {key: set(deps[key]) for key in first}
+        done, running = set(), {}
+        with ThreadPoolExecutor(max_workers=self.DAG_WORKERS) as pool:
+            while pending or running:
+                for key in [key for key, waiting in pending.items() if waiting <= done]:
+                    del pending[key]
+                    running[pool.submit(execute, key)] = key
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    value = future.result()
+                    with results_lock:
+                        if value is not skipped:
+                            results.setdefault(key, value)
+                        done.add(key)
+                        for dep in deps[key]:
+                            readers[dep] -= 1
+                            if readers[dep] == 0 and dep != graph['output']:
+                                results.pop(dep, None)
+        return results.get(graph['output'])
+
     def _print_summary(self, data: Any):
         """Helper to print a summary of the data."""
         if isinstance(data, list):
             print(f" (List: {len(data)} items)")
+        elif isinstance(data, SpilledRecords):
+            print(f" (Spilled to disk: {len(data)} items)")
         elif isinstance(data, str):
             print(f" (Str: {len(data)} chars)")
         elif isinstance(data, dict):
@@ -1,32 +1,498 @@
 import requests
 import os
+import bz2
+import glob
+import gzip
+import hashlib
+import json
+import locale
+import lzma
+import mmap
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
+from urllib.parse import urljoin
 
-from typing import Any, List, Dict
+from typing import Any, Iterator, List, Dict, Optional, Tuple
+from .cache import hash_file
 from .core import Block
+from .processors import CsvParser, get_nested_value
+from .spill import record_buffer
 
 class HttpSource(Block):
-    def process(self, data: Any, context: Any) -> Any:
-        url = self.config.get('url')
+    source = True
+    PAGE_STYLES = ('page', 'offset', 'link', 'cursor')
+
+    @property
+    def cacheable(self) -> bool:
+        # A paginated read caches each page on its own, so a rerun only re-fetches the tail
+        return not self.config.get('paginate')
+
+    def _request(self, context: Any, params: Dict[str, Any] = None, url: str = None):
+        url = url or self.config.get('url')
         if not url:
             raise ValueError("HttpSource requires 'url' in config")
-        
+
         method = self.config.get('method', 'GET')
         # In a real app, we might want to handle headers, params etc.
-        response = requests.request(method, url)
+        session = getattr(context, 'http_session', None)
+        if params:
+            response = (session or requests).request(method, url, params=params)
+        else:
+            response = (session or requests).request(method, url)
         response.raise_for_status()
-        return response.text
+        return response
+
+    def has_cache_token(self) -> bool:
+        return bool(self.config.get('paginate'))
+
+    def cache_token(self, context: Any = None) -> Optional[str]:
+        # Whether any page changed is only known by reading them (all but the tail come from
+        # the page cache), so the token is a hash of the records, which process() then reuses
+        if not self.config.get('paginate'):
+            return None
+        return hashlib.md5(json.dumps(self._read_pages(context), default=str).encode('utf-8')).hexdigest()
+
+    def _read_pages(self, context: Any) -> List[Any]:
+        # Read once per run, however often keys are computed (sub-pipelines, is_warm, ...)
+        memo = getattr(context, 'run_memo', None)
+        memo_key = ('pages', json.dumps(self.config, sort_keys=True, default=str))
+        if memo is not None and memo_key in memo:
+            return memo[memo_key]
+        records = []
+        for page in self.iter_pages(context):
+            records.extend(page)
+        if memo is not None:
+            memo[memo_key] = records
+        return records
 
-class FileSource(Block):
     def process(self, data: Any, context: Any) -> Any:
+        if self.config.get('paginate'):
+            return self._read_pages(context)
+        return self._request(context).text
+
+    def _paginate_options(self) -> Dict[str, Any]:
+        opts = self.config['paginate']
+        opts = dict(opts) if isinstance(opts, dict) else {}
+        style = opts.setdefault('style', 'page')
+        if style not in self.PAGE_STYLES:
+            raise ValueError(f"Unknown pagination style '{style}', expected one of {', '.join(self.PAGE_STYLES)}")
+        if style == 'offset' and not opts.get('page_size'):
+            raise ValueError("Offset pagination requires 'page_size'")
+        if style == 'cursor' and not opts.get('cursor_field'):
+            raise ValueError("Cursor pagination requires 'cursor_field'")
+        return opts
+
+    def _page_records(self, body: Any, opts: Dict[str, Any]) -> List[Any]:
+        records = get_nested_value(body, opts['records']) if opts.get('records') else body
+        if records is None:
+            return []
+        if not isinstance(records, list):
+            raise ValueError("Paginated response has no record list; set 'records' to its path")
+        return records
+
+    def _page_count(self, body: Any, opts: Dict[str, Any]) -> Optional[int]:
+        if opts.get('total_pages'):
+            total = get_nested_value(body, opts['total_pages'])
+            return int(total) if total is not None else None
+        if opts.get('total_records') and opts.get('page_size'):
+            total = get_nested_value(body, opts['total_records'])
+            return -(-int(total) // int(opts['page_size'])) if total is not None else None
+        return None
+
+    def _page_key(self, url: str, params: Optional[Dict[str, Any]]) -> str:
+        raw = json.dumps([self.config.get('method', 'GET'), url, params], sort_keys=True, default=str)
+        return "page-" + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+    def _cached_page(self, context: Any, key: str) -> Optional[Dict[str, Any]]:
+        store = getattr(context, 'cache', None)
+        if store is None or getattr(context, 'force_refresh', False):
+            return None
+        context.use_key(key)
+        return store.load(key)
+
+    def _save_page(self, context: Any, key: str, page: Dict[str, Any]):
+        store = getattr(context, 'cache', None)
+        if store is not None:
+            context.use_key(key)
+            store.save(key, page)
+
+    def iter_pages(self, context: Any) -> Iterator[List[Any]]:
+        """Yield the records of each page in order, following the configured pagination style."""
+        opts = self._paginate_options()
+        if opts['style'] in ('page', 'offset'):
+            return self._iter_numbered(context, opts)
+        return self._iter_linked(context, opts)
+
+    def _iter_numbered(self, context: Any, opts: Dict[str, Any]) -> Iterator[List[Any]]:
+        # paginate: { style: page|offset, param, start, page_size, size_param,
+        #             records, total_pages | total_records, max_pages, prefetch }
+        url = self.config.get('url')
+        style = opts['style']
+        param = opts.get('param', style)
+        start = int(opts.get('start', 1 if style == 'page' else 0))
+        page_size = int(opts['page_size']) if opts.get('page_size') else None
+        max_pages = int(opts.get('max_pages', 1000))
+
+        def params_for(index: int) -> Dict[str, Any]:
+            params = {param: start + index if style == 'page' else start + index * page_size}
+            if opts.get('size_param') and page_size:
+                params[opts['size_param']] = page_size
+            return params
+
+        def fetch(index: int, use_cache: bool = True) -> Tuple[str, Dict[str, Any], bool]:
+            params = params_for(index)
+            key = self._page_key(url, params)
+            page = self._cached_page(context, key) if use_cache else None
+            if page is not None:
+                return key, page, True
+            body = json.loads(self._request(context, params).text)
+            return key, {'records': self._page_records(body, opts), 'count': self._page_count(body, opts)}, False
+
+        # The first page is always fetched: it is where the current page count comes from
+        _, first, _ = fetch(0, use_cache=False)
+        yield first['records']
+        count = first['count']
+
+        if count is not None:
+            # Known page count: fetch ahead concurrently, yielding in page order. Every
+            # page but the last is complete, so those are cached for the next run.
+            count = min(count, max_pages)
+            prefetch = max(1, int(opts.get('prefetch', 4)))
+            with ThreadPoolExecutor(max_workers=prefetch) as pool:
+                for index, (key, page, cached) in enumerate(pool.map(fetch, range(1, count)), start=1):
+                    if not cached and index < count - 1:
+                        self._save_page(context, key, page)
+                    yield page['records']
+            return
+
+        # Unknown page count: walk until an empty or short page. A page is only cached
+        # once the one after it turns out to have records, i.e. it was not the tail.
+        if not first['records'] or (page_size and len(first['records']) < page_size):
+            return
+        pending = None
+        for index in range(1, max_pages):
+            key, page, cached = fetch(index)
+            if not page['records']:
+                break
+            if pending:
+                self._save_page(context, *pending)
+            pending = None if cached else (key, page)
+            yield page['records']
+            if page_size and len(page['records']) < page_size:
+                break
+
+    def _iter_linked(self, context: Any, opts: Dict[str, Any]) -> Iterator[List[Any]]:
+        # paginate: { style: link|cursor, records, cursor_field, param, max_pages }
+        # 'link' follows the Link: <...>; rel="next" header, 'cursor' sends the body's
+        # cursor_field back as param. Pages that point to a next page are cached.
+        url = self.config.get('url')
+        style = opts['style']
+        params = None
+        for _ in range(int(opts.get('max_pages', 1000))):
+            key = self._page_key(url, params)
+            page = self._cached_page(context, key)
+            if page is None:
+                response = self._request(context, params, url=url)
+                body = json.loads(response.text)
+                if style == 'link':
+                    next_ref = response.links.get('next', {}).get('url')
+                else:
+                    next_ref = get_nested_value(body, opts['cursor_field'])
+                page = {'records': self._page_records(body, opts), 'next': next_ref}
+                if next_ref:
+                    self._save_page(context, key, page)
+            yield page['records']
+
+            if not page['next']:
+                break
+            if style == 'link':
+                url, params = urljoin(url, page['next']), None
+            else:
+                params = {opts.get('param', 'cursor'): page['next']}
+
+    def supports_incremental(self) -> bool:
+        return bool(self.config.get('incremental'))
+
+    def delta_has_header(self) -> bool:
+        # Each incremental read is a complete response of its own
+        return True
+
+    def read_incremental(self, state: Optional[Dict[str, Any]], context: Any) -> Tuple[Any, Dict[str, Any], bool]:
+        # incremental: { param: since, cursor_header: X-Next-Cursor }
+        # The cursor is sent as a query param; it comes from a response header if configured,
+        # otherwise it is the time the previous request started (ISO 8601, UTC).
+        opts = self.config.get('incremental')
+        opts = opts if isinstance(opts, dict) else {}
+        param = opts.get('param', 'since')
+        cursor_header = opts.get('cursor_header')
+
+        cursor = state.get('cursor') if state else None
+        started = datetime.now(timezone.utc).isoformat()
+        response = self._request(context, {param: cursor} if cursor is not None else None)
+
+        next_cursor = response.headers.get(cursor_header) if cursor_header else started
+        if next_cursor is None:
+            next_cursor = cursor
+        return response.text, {'cursor': next_cursor}, cursor is not None
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+# Compressed files are decompressed while reading, picked by extension or else by magic bytes
+COMPRESSION_OPENERS = {'gzip': gzip.open, 'xz': lzma.open, 'bz2': bz2.open}
+_COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.xz': 'xz', '.lzma': 'xz', '.bz2': 'bz2'}
+_COMPRESSION_MAGIC = [(b'\x1f\x8b', 'gzip'), (b'\xfd7zXZ\x00', 'xz'), (b'BZh', 'bz2')]
+
+def _compression(path: str, compression: str = 'auto') -> Optional[str]:
+    # compression: auto (default) | none | gzip | xz | bz2
+    if compression in (None, 'auto'):
+        ext = os.path.splitext(path)[1].lower()
+        if ext in _COMPRESSION_EXTENSIONS:
+            return _COMPRESSION_EXTENSIONS[ext]
+        with open(path, 'rb') as f:
+            head = f.read(6)
+        return next((name for magic, name in _COMPRESSION_MAGIC if head.startswith(magic)), None)
+    if compression == 'none':
+        return None
+    if compression not in COMPRESSION_OPENERS:
+        raise ValueError(f"FileSource 'compression' must be auto, none or one of {', '.join(COMPRESSION_OPENERS)}")
+    return compression
+
+def _read_file(path: str, encoding: Optional[str] = None, compression: str = 'auto') -> str:
+    """Read a whole file as text, decompressing on the fly. The default encoding is the platform's."""
+    codec = _compression(path, compression)
+    opener = COMPRESSION_OPENERS[codec] if codec else open
+    with opener(path, 'rt', encoding=encoding) as f:
+        return f.read()
+
+def _parse_file(path: str, parse: str, delimiter: Optional[str], encoding: Optional[str] = None,
+                compression: str = 'auto') -> List[Any]:
+    # Runs in a worker process for multi-file reads; returns the file's records
+    text = _read_file(path, encoding, compression)
+    if parse == 'csv':
+        return CsvParser({'delimiter': delimiter} if delimiter else {}).process(text, None)
+    if parse == 'json':
+        data = json.loads(text)
+        return data if isinstance(data, list) else [data]
+    if parse == 'jsonl':
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [text]
+
+class FileSource(Block):
+    source = True
+    # Bytes at the start of the file used to detect rewrites between incremental reads
+    HEAD_BYTES = 4096
+    PARSE_FORMATS = ('text', 'csv', 'json', 'jsonl')
+
+    def _is_multi(self) -> bool:
+        return 'paths' in self.config or bool(_GLOB_CHARS.search(self.config.get('path') or ''))
+
+    FINGERPRINTS = ('stat', 'content')
+
+    @property
+    def cacheable(self) -> bool:
+        # A memory map is only valid in this process, so it is never cached
+        return self.config.get('mode', 'text') != 'mmap'
+
+    def has_cache_token(self) -> bool:
+        return True
+
+    def cache_token(self, context: Any = None) -> Optional[str]:
+        # The files' stat (or content hash) is part of the cache key: unchanged files are served
+        # from cache without being read, a changed file invalidates this step and those after it.
+        # The runner leaves it out when it reads the file incrementally (the source then tracks
+        # the file itself), but not where the file is read in full, e.g. in DAG pipelines.
+        fingerprint = self.config.get('fingerprint', 'stat')
+        if fingerprint not in self.FINGERPRINTS:
+            raise ValueError(f"FileSource 'fingerprint' must be one of {', '.join(self.FINGERPRINTS)}")
+        paths = self._matched_paths() if self._is_multi() else [self.config.get('path')]
+        parts = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except (OSError, TypeError):
+                # Missing: the step runs and reports it
+                parts.append([path, None])
+                continue
+            if fingerprint == 'content':
+                # Survives touches, checkouts and copies that leave the bytes unchanged
+                parts.append([os.path.abspath(path), st.st_size, hash_file(path)])
+            else:
+                parts.append([os.path.abspath(path), st.st_mtime_ns, st.st_size, st.st_ino])
+        return json.dumps(parts)
+
+    def _checked_path(self) -> str:
         path = self.config.get('path')
         if not path:
              raise ValueError("FileSource requires 'path' in config")
-        
+
         if not os.path.exists(path):
             raise FileNotFoundError(f"File not found: {path}")
+        return path
+
+    def process(self, data: Any, context: Any) -> Any:
+        if self._is_multi():
+            return self._read_many(context)
+
+        path = self._checked_path()
+        encoding = self.config.get('encoding')
+        compression = self.config.get('compression', 'auto')
+        mode = self.config.get('mode', 'text')
+
+        if mode == 'mmap':
+            # mode: mmap returns the raw bytes as a read-only memory map, which json_parser,
+            # csv_parser, xml_parser and html_selector read without decoding a full copy first
+            codec = _compression(path, compression)
+            if codec:
+                # A compressed file has no mappable plain bytes; decompress into memory instead
+                with COMPRESSION_OPENERS[codec](path, 'rb') as f:
+                    return f.read()
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b''
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mode != 'text':
+            raise ValueError("FileSource 'mode' must be 'text' or 'mmap'")
+
+        return _read_file(path, encoding, compression)
+
+    def _matched_paths(self) -> List[str]:
+        patterns = self.config.get('paths') or [self.config.get('path')]
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        matched = {}
+        for pattern in patterns:
+            if _GLOB_CHARS.search(pattern):
+                for path in sorted(glob.glob(pattern, recursive=True)):
+                    if os.path.isfile(path):
+                        matched.setdefault(path, None)
+            elif os.path.exists(pattern):
+                matched.setdefault(pattern, None)
+            else:
+                raise FileNotFoundError(f"File not found: {pattern}")
+        if not matched:
+            raise FileNotFoundError(f"No files match: {', '.join(patterns)}")
+        return list(matched)
+
+    def _read_many(self, context: Any) -> Any:
+        # path: data/*.csv  (or paths: [a.json, b/*.json])
+        # parse: text|csv|json|jsonl, tag: <field for the file name>, workers: <processes>
+        parse = self.config.get('parse', 'text')
+        if parse not in self.PARSE_FORMATS:
+            raise ValueError(f"FileSource 'parse' must be one of {', '.join(self.PARSE_FORMATS)}")
+        delimiter = self.config.get('delimiter')
+        encoding = self.config.get('encoding')
+        compression = self.config.get('compression', 'auto')
+        paths = self._matched_paths()
+
+        # Each file's records are cached under its path, mtime and size
+        store = getattr(context, 'cache', None)
+        refresh = getattr(context, 'force_refresh', False)
+        records, keys = {}, {}
+        for path in paths:
+            st = os.stat(path)
+            raw = json.dumps([os.path.abspath(path), st.st_mtime_ns, st.st_size, parse, delimiter, encoding, compression])
+            keys[path] = "file-" + hashlib.md5(raw.encode('utf-8')).hexdigest()
+            if store is not None:
+                context.use_key(keys[path])
+                cached = None if refresh else store.load(keys[path])
+                if cached is not None:
+                    records[path] = cached
+
+        todo = [path for path in paths if path not in records]
+        workers = int(self.config.get('workers', getattr(context, 'parallel_workers', None) or os.cpu_count() or 1))
+        if len(todo) > 1 and workers > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+                parsed = list(pool.map(_parse_file, todo, repeat(parse), repeat(delimiter),
+                                       repeat(encoding), repeat(compression)))
+        else:
+            parsed = [_parse_file(path, parse, delimiter, encoding, compression) for path in todo]
+        for path, file_records in zip(todo, parsed):
+            records[path] = file_records
+            if store is not None:
+                store.save(keys[path], file_records)
+
+        tag = self.config.get('tag')
+        combined = record_buffer(context)
+        for path in paths:
+            for record in records[path]:
+                if tag:
+                    record = {**record, tag: path} if isinstance(record, dict) else {tag: path, 'content': record}
+                combined.append(record)
+        return combined.result()
+
+    def supports_incremental(self) -> bool:
+        # Multi-file reads are incremental per file already
+        return bool(self.config.get('incremental')) and not self._is_multi()
+
+    def _header_lines(self) -> int:
+        # CSV and TSV files default to one header line, so parsing new rows never takes the first as the header
+        header_lines = self.config.get('header_lines')
+        if header_lines is not None:
+            return int(header_lines)
+        path = self.config.get('path') or ''
+        root, ext = os.path.splitext(path.lower())
+        if ext in _COMPRESSION_EXTENSIONS:
+            ext = os.path.splitext(root)[1]
+        return 1 if ext in ('.csv', '.tsv') else 0
+
+    def delta_has_header(self) -> bool:
+        return self._header_lines() > 0
+
+    def read_incremental(self, state: Optional[Dict[str, Any]], context: Any) -> Tuple[Any, Dict[str, Any], bool]:
+        # For append-only files: remember the byte offset reached and only read what follows.
+        # A file that was replaced, truncated or rewritten at the start is read in full again.
+        path = self._checked_path()
+        header_lines = self._header_lines()
+        encoding = self.config.get('encoding') or locale.getpreferredencoding(False)
+        if _compression(path, self.config.get('compression', 'auto')):
+            # Offsets into a compressed stream cannot be resumed from, so read it in full. The
+            # fingerprint is the state, so the watermark (and the keys after it) follow the file.
+            state = {'fingerprint': self.cache_token(context)}
+            return _read_file(path, encoding, self.config.get('compression', 'auto')), state, False
+        st = os.stat(path)
+
+        with open(path, 'rb') as f:
+            raw = None
+            if state and state.get('offset') is not None and state.get('inode') == st.st_ino \
+                    and st.st_size >= state['offset']:
+                head = f.read(state['head_len'])
+                if hashlib.md5(head).hexdigest() == state['head_hash']:
+                    f.seek(state['offset'])
+                    raw = f.read()
 
-        with open(path, 'r') as f:
-            return f.read()
+            is_delta = raw is not None
+            if is_delta:
+                # Only whole lines are consumed; a line still being written is left for the next run
+                end = raw.rfind(b'\n') + 1
+                raw = raw[:end]
+                offset = state['offset'] + end
+            else:
+                f.seek(0)
+                raw = f.read()
+                # A full read returns the whole file. If it ends mid-line there is no safe place
+                # to resume from, so the next run reads in full again.
+                offset = len(raw) if raw.endswith(b'\n') or not raw else None
 
+            f.seek(0)
+            head = f.read(self.HEAD_BYTES)
 
+        text = raw.decode(encoding)
+        if is_delta:
+            header = state.get('header', '')
+            text = header + text
+        else:
+            header = ''.join(text.splitlines(keepends=True)[:header_lines])
 
+        new_state = {
+            'inode': st.st_ino,
+            'offset': offset,
+            # Without a resumable offset, the watermark still has to change with the file
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'head_len': len(head),
+            'head_hash': hashlib.md5(head).hexdigest(),
+            'header': header,
+        }
+        return text, new_state, is_delta
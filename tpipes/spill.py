@@ -0,0 +1,245 @@
+import os
+import pickle
+import re
+import struct
+import sys
+import tempfile
+import threading
+import weakref
+from array import array
+from typing import Any, Iterable, Iterator, List, Optional
+
+# Spilled rows are stored back to back as frames: u32 length + pickled record.
+# A file starts with the row count (u64), so len() never has to scan it.
+FRAME = struct.Struct("<I")
+COUNT = struct.Struct("<Q")
+
+# How often (in appended records) a RecordBuffer re-estimates its size
+CHECK_EVERY = 1024
+# Records sampled when estimating the size of a long list
+SAMPLE_SIZE = 64
+
+_SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+
+def parse_size(value: Any) -> Optional[int]:
+    """'512M', '2G', '1500000' -> bytes. None and 0 mean no limit."""
+    if value is None or isinstance(value, int):
+        return value or None
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*", str(value).lower())
+    if not match:
+        raise ValueError(f"Invalid size '{value}' (expected e.g. 512M or 2G)")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)]) or None
+
+
+def _deep_size(obj: Any, depth: int = 0) -> int:
+    size = sys.getsizeof(obj)
+    if depth > 4:
+        return size
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, depth + 1) + _deep_size(v, depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(v, depth + 1) for v in obj)
+    return size
+
+
+def estimate_size(data: Any) -> int:
+    """Rough in-memory size of a result; long lists are estimated from a sample of records."""
+    if isinstance(data, SpilledRecords):
+        return 0
+    if isinstance(data, list) and len(data) > SAMPLE_SIZE:
+        step = len(data) // SAMPLE_SIZE
+        sample = data[::step][:SAMPLE_SIZE]
+        return sys.getsizeof(data) + sum(_deep_size(item) for item in sample) * len(data) // len(sample)
+    return _deep_size(data)
+
+
+def is_record_list(data: Any) -> bool:
+    return isinstance(data, (list, SpilledRecords))
+
+
+class SpilledRecords:
+    """Read-only, lazily loaded list of records kept in a file instead of memory.
+
+    Supports iteration, len(), indexing and slicing (slices come back as lists), so
+    record-wise blocks can treat it like a list. Files spilled during a run are
+    deleted once the view is garbage collected.
+    """
+
+    def __init__(self, path: str, offset: int = 0, owned: bool = False, loads=pickle.loads):
+        self.path = path
+        self.offset = offset
+        self.loads = loads
+        self._file = open(path, 'rb')
+        self._file.seek(offset)
+        self._count = COUNT.unpack(self._file.read(COUNT.size))[0]
+        self._index = None
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _close_spill, self._file, path if owned else None)
+
+    @classmethod
+    def from_iterable(cls, records: Iterable[Any], spill_dir: str = None) -> 'SpilledRecords':
+        writer = SpillWriter(spill_dir)
+        try:
+            for record in records:
+                writer.append(record)
+        except BaseException:
+            writer.discard()
+            raise
+        return writer.finish()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _read_frame(self, f) -> Any:
+        (length,) = FRAME.unpack(f.read(FRAME.size))
+        return self.loads(f.read(length))
+
+    def __iter__(self) -> Iterator[Any]:
+        # Each iterator gets its own handle, so nested or concurrent loops don't interfere
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset + COUNT.size)
+            for _ in range(self._count):
+                yield self._read_frame(f)
+
+    def _build_index(self):
+        index = array('Q')
+        with open(self.path, 'rb') as f:
+            pos = self.offset + COUNT.size
+            for _ in range(self._count):
+                index.append(pos)
+                f.seek(pos)
+                pos += FRAME.size + FRAME.unpack(f.read(FRAME.size))[0]
+        self._index = index
+
+    def __getitem__(self, idx: Any) -> Any:
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self._count)
+            if step == 1:
+                # Contiguous slices (e.g. data[:10]) are read in one pass
+                out = []
+                for pos, record in enumerate(self):
+                    if pos >= stop:
+                        break
+                    if pos >= start:
+                        out.append(record)
+                return out
+            return [self[i] for i in range(start, stop, step)]
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("spilled record index out of range")
+        with self._lock:
+            if self._index is None:
+                self._build_index()
+            self._file.seek(self._index[idx])
+            return self._read_frame(self._file)
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def __reduce__(self):
+        # Anything that pickles the view (nested results, process pipes) gets a plain list
+        return (list, (list(self),))
+
+    def __repr__(self) -> str:
+        return f"<SpilledRecords {self._count} records at {self.path}>"
+
+    def copy_to(self, out):
+        """Write the raw row data (count + frames) to an open binary file."""
+        end = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            remaining = end - self.offset
+            while remaining:
+                chunk = f.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                out.write(chunk)
+                remaining -= len(chunk)
+
+
+def _close_spill(f, path: Optional[str]):
+    f.close()
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+class SpillWriter:
+    def __init__(self, spill_dir: str = None):
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=spill_dir, prefix="tpipes-spill-", suffix=".rows")
+        self._file = os.fdopen(fd, 'wb')
+        self._file.write(COUNT.pack(0))
+        self.count = 0
+
+    def append(self, record: Any):
+        payload = pickle.dumps(record, protocol=5)
+        self._file.write(FRAME.pack(len(payload)))
+        self._file.write(payload)
+        self.count += 1
+
+    def discard(self):
+        self._file.close()
+        os.remove(self.path)
+
+    def finish(self) -> SpilledRecords:
+        self._file.seek(0)
+        self._file.write(COUNT.pack(self.count))
+        self._file.close()
+        return SpilledRecords(self.path, owned=True)
+
+
+class RecordBuffer:
+    """Accumulates records in a list until they exceed max_bytes, then in a spill file."""
+
+    def __init__(self, max_bytes: int = None, spill_dir: str = None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.items: List[Any] = []
+        self.writer: Optional[SpillWriter] = None
+
+    def append(self, record: Any):
+        if self.writer:
+            self.writer.append(record)
+            return
+        self.items.append(record)
+        if self.max_bytes and len(self.items) % CHECK_EVERY == 0 and estimate_size(self.items) > self.max_bytes:
+            self._spill()
+
+    def extend(self, records: Iterable[Any]):
+        for record in records:
+            self.append(record)
+
+    def _spill(self):
+        writer = SpillWriter(self.spill_dir)
+        try:
+            for record in self.items:
+                writer.append(record)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            writer.discard()
+            self.max_bytes = None
+            return
+        self.writer = writer
+        self.items = []
+
+    def result(self) -> Any:
+        return self.writer.finish() if self.writer else self.items
+
+
+def record_buffer(context: Any) -> RecordBuffer:
+    """A RecordBuffer honouring the run's memory budget (unbounded without one)."""
+    return RecordBuffer(getattr(context, 'max_memory', None), getattr(context, 'spill_dir', None))
+
+
+def spill_if_large(data: Any, context: Any) -> Any:
+    """Move a list result over the run's memory budget to disk, returning a lazy view."""
+    max_bytes = getattr(context, 'max_memory', None)
+    if not max_bytes or not isinstance(data, list) or estimate_size(data) <= max_bytes:
+        return data
+    try:
+        return SpilledRecords.from_iterable(data, getattr(context, 'spill_dir', None))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # Records that cannot be serialized (open handles, parsed documents, ...) stay in memory
+        return data